@@ -1,9 +1,68 @@
 import re  # 正则表达式
-import graphviz  # 可视化库
 import keyword  # Python关键字列表
-from anytree import Node, RenderTree  # 树结构
-from collections import deque  # 双端队列
+from array import array  # 紧凑的签名数组
+from CompactTree import TreeBuilder, SIGNATURES  # 紧凑树存储
 from io import StringIO  # 内存文件操作
+from functools import lru_cache  # 进程级结果缓存
+from lexer import scan, tokenize, join_tokens, TRIVIA  # 词法分析
+from expression import parse_expression, BINARY_PRECEDENCE  # Pratt表达式解析
+from ParseCache import ParseCache  # 建树缓存
+import pqgram  # pq-gram轮廓
+from lcs import lcs_similarity  # 位并行最长公共子序列
+from kernel import normalized_kernel  # 子集树核
+from matching import hopcroft_karp, max_weight_transport  # 二分图匹配
+
+# 表达式简化使用的预编译正则
+NUMBER_PATTERN = re.compile(r'\b\d+(\.\d+)?\b')
+STRING_PATTERN = re.compile(r'".*?"')
+# 预处理使用的预编译正则
+WORD_PATTERN = re.compile(r'\w+')
+IDENTIFIER_PATTERN = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*')
+IDENTIFIER_START = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_')
+
+# 括号检测关心的token首字符
+BRACKETS = frozenset('()[]')
+LINE_BREAKERS = frozenset('\n/"\'')
+# 空白token的首字符
+WHITESPACE = frozenset(' \t\r\f\v\n')
+
+# 语句解析时配对的括号
+OPEN_BRACKETS = frozenset('([{')
+CLOSE_BRACKETS = frozenset(')]}')
+
+
+@lru_cache(maxsize=65536)
+def simplify_expression(expr):
+    """简化表达式，忽略操作数具体值
+
+    标识符在预处理阶段已统一替换为var，这里只需处理空格、运算符、数值和字符串。
+    学生代码中i++、var < var之类的表达式高度重复，按原始字符串缓存结果
+    """
+    # 移除所有空格
+    expr = expr.replace(" ", "")
+    # 标准化运算符
+    expr = expr.replace("!=", "≠").replace("==", "=")
+    # 将数值替换为"#"
+    expr = NUMBER_PATTERN.sub('#', expr)
+    # 将字符串替换为"str"
+    expr = STRING_PATTERN.sub('str', expr)
+    return expr
+
+def split_top_level(tokens, sep, maxsplit=-1):
+    """按不在括号内的分隔符拆分token序列，返回各段的(起始, 结束)下标"""
+    bounds = []
+    depth = 0
+    start = 0
+    for i, token in enumerate(tokens):
+        if token in OPEN_BRACKETS:
+            depth += 1
+        elif token in CLOSE_BRACKETS:
+            depth -= 1
+        elif token == sep and depth == 0 and len(bounds) != maxsplit:
+            bounds.append((start, i))
+            start = i + 1
+    bounds.append((start, len(tokens)))
+    return bounds
 
 # ====================
 # CodeTree类：处理代码解析和树结构操作
@@ -18,27 +77,60 @@ class CodeTree:
         'volatile', 'while', 'printf', 'scanf', 'main'
     })
 
-    # 运算符优先级字典
-    OPERATOR_PRECEDENCE = {
-        '=': 1, '+=': 1, '-=': 1, '*=': 1, '/=': 1,
-        '||': 2, '&&': 3, '|': 4, '^': 5, '&': 6,
-        '==': 7, '!=': 7, '<': 8, '>': 8, '<=': 8, '>=': 8,
-        '<<': 9, '>>': 9, '+': 10, '-': 10, '*': 11, '/': 11, '%': 11
-    }
+    # 二元运算符优先级（整数，数值越大结合越紧；定义见expression.py）
+    OPERATOR_PRECEDENCE = BINARY_PRECEDENCE
+
+    # 以这些关键字开头的语句按变量声明处理
+    DECLARATION_KEYWORDS = frozenset((
+        'int', 'float', 'char', 'double', 'long', 'short', 'signed', 'unsigned',
+        'const', 'static', 'register', 'volatile', 'auto', 'extern', 'struct', 'enum', 'union'
+    ))
+
+    # 相似性判断时需要比较子节点数量和表达式的节点类型
+    STRUCTURAL_NODES = ('if', 'else if', 'for', 'while', 'expression', 'condition', 'else')
+
+    # 解析器/规范化版本号：修改预处理或建树逻辑时递增，使旧的缓存失效
+    PARSER_VERSION = 4
+    # 进程内共享的建树缓存（设为None可关闭缓存）
+    parse_cache = ParseCache()
+    # 教师模板（Template）：其中出现过的子树不参与匹配，也不计入总节点数（None表示不排除）
+    template = None
+    # calculate_similarity支持的计算模式
+    MODES = ('bucket', 'greedy', 'ted', 'pqgram', 'optimal', 'weighted', 'lcs', 'kernel', 'idf')
+    # 支持教师模板的计算模式（其余模式对全部节点计分，设置模板时拒绝计算）
+    TEMPLATE_MODES = ('bucket', 'greedy', 'optimal', 'weighted', 'idf')
+    # 语料统计（CorpusStats）：'idf'模式按子树片段的文档频率降低常见写法的权重
+    corpus_stats = None
 
     def __init__(self):
         self.root = None # 树的根节点
         self.preprocessed_code = "" # 预处理后的代码
         self.source_code = ""  # 原始源代码
         self.total_nodes = 0 # 节点总数
+        self.compact = None # 紧凑树存储（CompactTree）
+        self._builder = None # 建树期间使用的缓冲区
+        self._profiles = {} # (p, q) -> pq-gram轮廓缓存
+        self._lexed = None # (源代码, token流)缓存
 
     def set_source_code(self, code):
         """设置源代码"""
         self.source_code = code # 将传入的代码赋值给实例变量source_code，用于存储原始源代码
         self.preprocessed_code = "" # 清空预处理后的代码，因为源代码已更新，需要重新预处理
         self.root = None # 将根节点重置为None，因为源代码已更新，需要重新构建树结构
+        self.compact = None # 紧凑树同样需要重新构建
+        self._profiles = {}
         self.total_nodes = 0  # 将节点计数器重置为0，因为树结构需要重新构建
 
+    def load_compact(self, compact, preprocessed_code="", total_nodes=0):
+        """直接载入已构建好的紧凑树（来自缓存、磁盘或共享内存）"""
+        self.compact = compact
+        self.preprocessed_code = preprocessed_code
+        self.total_nodes = total_nodes
+        self._profiles = {}
+        self.root = compact.root
+        self._node_signatures()
+        return self.root
+
     def preprocess_code(self, code=None):
         """
         预处理代码：移除注释，替换标识符为var
@@ -48,24 +140,75 @@ class CodeTree:
         if not input_code:
             return ""
 
-        # 移除多行注释
-        code_cleaned = re.sub(r'/\*.*?\*/', '', input_code, flags=re.DOTALL) # 匹配包括换行符在内的所有字符
-        # 移除单行注释
-        code_cleaned = re.sub(r'//.*$', '', code_cleaned, flags=re.MULTILINE) # 使$匹配每行的结尾
-        # 替换标识符为var（非关键字）
-        tokens = re.split(r'(\W)', code_cleaned) # 分割成列表
         new_tokens = []
-        for token in tokens:
-            if token.strip() and not token.isspace():
-                # 如果是标识符（字母/下划线开头，包含字母/数字/下划线）且不是关键字，替换为'var'
-                if re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', token) and token not in self.KEYWORDS:
+        for text in self._lex(input_code):
+            first = text[0]
+            if first in IDENTIFIER_START:
+                # 标识符（纯ASCII）且不是关键字，替换为'var'
+                if text.isascii() and text not in self.KEYWORDS:
                     new_tokens.append('var')
                 else:
-                    new_tokens.append(token)
+                    new_tokens.append(text)
+            elif first == '/' and text[:2] in ('//', '/*'):
+                # 移除注释（由词法分析统一识别，不会误删字符串中的//）
+                continue
+            elif first == '"' or first == "'":
+                # 字符串/字符常量内部的单词同样做标识符替换
+                new_tokens.append(WORD_PATTERN.sub(self._normalize_word, text))
             else:
-                new_tokens.append(token) # 空白字符（空格、制表符等）直接保留
+                new_tokens.append(text) # 运算符、数字、空白字符等直接保留
         return ''.join(new_tokens).replace('  ', ' ').replace('\t', ' ')
 
+    def _normalize_word(self, match):
+        """字符串内单词的标识符替换规则"""
+        word = match.group()
+        if IDENTIFIER_PATTERN.fullmatch(word) and word not in self.KEYWORDS:
+            return 'var'
+        return word
+
+    def normalized_tokens(self, code=None):
+        """预处理后的token流（不含空白和注释），每项为(token文本, 源代码行号)"""
+        input_code = code if code is not None else self.source_code
+        if not input_code:
+            return []
+
+        result = []
+        for token in tokenize(input_code, self._lex(input_code)):
+            kind = token.kind
+            if kind in TRIVIA:
+                continue
+            if kind == 'ident':
+                text = token.text if token.text in self.KEYWORDS else 'var'
+            elif kind == 'string' or kind == 'char':
+                text = WORD_PATTERN.sub(self._normalize_word, token.text)
+            else:
+                text = token.text
+            result.append((text, token.line))
+        return result
+
+    def _normalized_texts(self):
+        """与normalized_tokens()相同的token文本序列，不计算行号，供建树使用"""
+        texts = []
+        append = texts.append
+        keywords = self.KEYWORDS
+        for text in self._lex(self.source_code):
+            first = text[0]
+            if first in IDENTIFIER_START:
+                append('var' if text.isascii() and text not in keywords else text)
+            elif first in WHITESPACE or (first == '/' and text[:2] in ('//', '/*')):
+                continue
+            elif first == '"' or first == "'":
+                append(WORD_PATTERN.sub(self._normalize_word, text))
+            else:
+                append(text)
+        return texts
+
+    def _lex(self, code):
+        """词法扫描结果按源代码缓存，预处理和括号检测共用同一份token流"""
+        if self._lexed is None or self._lexed[0] != code:
+            self._lexed = (code, scan(code))
+        return self._lexed[1]
+
     def extract_main_body(self, code):
         """提取main函数体"""
         # 查找main函数的大致位置
@@ -113,127 +256,54 @@ class CodeTree:
 
         errors = []  # 存储检测到的错误
         bracket_stack = []  # 括号匹配栈
-        in_comment = False  # 多行注释状态
-        in_single_comment = False  # 单行注释状态
-        in_string = False  # 字符串状态
-        in_char = False  # 字符常量状态
+
         # 行号和位置计数器：精确定位错误位置
         current_line = 1
-        current_position = 0
-
-        # 逐字符扫描代码
-        i = 0
-        n = len(code)
-        while i < n:
-            char = code[i]
-            current_position += 1
-
-            # 处理换行
-            if char == '\n':
-                current_line += 1
-                current_position = 0
-                in_single_comment = False  # 单行注释在换行时结束
-                i += 1
-                continue
-
-            # 处理多行注释
-            if in_comment:
-                # 检查注释结束
-                if char == '*' and i + 1 < n and code[i + 1] == '/':
-                    in_comment = False
-                    i += 2  # 跳过 '/' 字符
-                    current_position += 1
-                    continue
-                i += 1
-                continue
-
-            # 处理单行注释
-            if in_single_comment:
-                i += 1
-                continue
-
-            # 处理字符串中的内容
-            if in_string:
-                # 处理转义字符
-                if char == '\\':
-                    # 跳过下一个字符
-                    i += 1
-                    current_position += 1
-                # 字符串结束
-                elif char == '"':
-                    in_string = False
-                i += 1
-                continue
-
-            # 处理字符常量
-            if in_char:
-                # 处理转义字符
-                if char == '\\':
-                    # 跳过下一个字符
-                    i += 1
-                    current_position += 1
-                # 字符结束
-                elif char == "'":
-                    in_char = False
-                i += 1
-                continue
-
-            # 检测注释开始
-            if char == '/':
-                # 检查是单行注释还是多行注释
-                if i + 1 < n:
-                    next_char = code[i + 1]
-                    if next_char == '/':  # 单行注释
-                        in_single_comment = True
-                    elif next_char == '*':  # 多行注释
-                        in_comment = True
-                i += 1
-                continue
-
-            # 检测字符串开始
-            if char == '"':
-                in_string = True
-                i += 1
-                continue
-
-            # 检测字符常量开始
-            if char == "'":
-                in_char = True
-                i += 1
-                continue
-
-            # 括号匹配检测
-            if char in '([':
-                # 遇到开括号，压入栈
-                bracket_stack.append({
-                    'type': char,
-                    'line': current_line,
-                    'position': current_position
-                })
-            elif char in ')]':
-                # 遇到闭括号
-                if not bracket_stack:
-                    # 栈为空，多余的闭括号
-                    errors.append({
-                        'type': 'bracket',
-                        'message': f"多余的闭括号 '{char}'",
+        line_start = 0
+        offset = 0
+
+        # 扫描token流：注释、字符串和字符常量已由词法分析整体识别并跳过
+        for text in self._lex(code):
+            char = text[0]
+            if char in BRACKETS:
+                current_position = offset - line_start + 1
+                # 括号匹配检测
+                if char in '([':
+                    # 遇到开括号，压入栈
+                    bracket_stack.append({
+                        'type': char,
                         'line': current_line,
                         'position': current_position
                     })
                 else:
-                    # 弹出最近的括号
-                    last_open = bracket_stack.pop()
-                    # 检查括号类型是否匹配
-                    if (char == ')' and last_open['type'] != '(') or \
-                            (char == ']' and last_open['type'] != '['):
+                    # 遇到闭括号
+                    if not bracket_stack:
+                        # 栈为空，多余的闭括号
                         errors.append({
                             'type': 'bracket',
-                            'message': f"括号不匹配: '{last_open['type']}' 与 '{char}'",
-                            'line': last_open['line'],
-                            'position': last_open['position']
+                            'message': f"多余的闭括号 '{char}'",
+                            'line': current_line,
+                            'position': current_position
                         })
-
-            i += 1
+                    else:
+                        # 弹出最近的括号
+                        last_open = bracket_stack.pop()
+                        # 检查括号类型是否匹配
+                        if (char == ')' and last_open['type'] != '(') or \
+                                (char == ']' and last_open['type'] != '['):
+                            errors.append({
+                                'type': 'bracket',
+                                'message': f"括号不匹配: '{last_open['type']}' 与 '{char}'",
+                                'line': last_open['line'],
+                                'position': last_open['position']
+                            })
+            elif char in LINE_BREAKERS:
+                # 换行、注释、字符串和字符常量可能跨行
+                newlines = text.count('\n')
+                if newlines:
+                    current_line += newlines
+                    line_start = offset + text.rfind('\n') + 1
+            offset += len(text)
 
         # 检查栈中剩余的未关闭括号
         for bracket in bracket_stack:
@@ -248,384 +318,360 @@ class CodeTree:
 
     # 答辩点 2
     def build_tree(self, code):
-        """构建代码树"""
+        """构建代码树（相同内容的源代码直接复用缓存中的树）"""
         self.source_code = code
+        self.root = None
+        self.compact = None
+        self._profiles = {}
+
+        cache_key = None
+        if self.parse_cache is not None:
+            cache_key = ParseCache.make_key(code, self.PARSER_VERSION)
+            cached = self.parse_cache.get(cache_key)
+            if cached is not None:
+                preprocessed_code, total_nodes, compact = cached
+                return self.load_compact(compact, preprocessed_code, total_nodes)
+
         self.preprocessed_code = self.preprocess_code()
-        main_body = self.extract_main_body(self.preprocessed_code)
-        if not main_body:
+        tokens = self._normalized_texts()
+        self._lexed = None  # 建树后不再保留token列表
+        start = self._find_main_body(tokens)
+        if start is None:
             raise ValueError("未找到有效的main函数体")
 
-        self.root = Node("main")
+        self._builder = TreeBuilder()
+        root = self._builder.add("main")
         self.total_nodes = 1
 
-        stack = [self.root]  # 当前层次的父节点堆栈
-        lines = main_body.split('\n')
-        current_control = None  # 当前控制节点
-        pending_else = None  # 待处理的else节点
-        block_stack = []  # 代码块堆栈
-        skip_next_line = False  # 标记是否跳过下一行
-
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-
-            if skip_next_line:
-                skip_next_line = False
-                continue
-
-            # 处理 } else 组合
-            if '}' in line and 'else' in line:
-                parts = re.split(r'(})', line)
-                if parts[0].strip():
-                    self._parse_line(parts[0].strip(), stack[-1])
-
-                if block_stack:
-                    stack.pop()
-                    block_stack.pop()
-
-                else_part = ''.join(parts[2:]).strip()
-                if else_part:
-                    if 'if' in else_part:
-                        # 处理 else if
-                        cond_start = else_part.find('if') + 2
-                        condition = else_part[cond_start:].strip().strip('()')
-                        else_if_node = Node("else if", parent=stack[-1])
-                        self.total_nodes += 1
-                        cond_node = Node("condition", parent=else_if_node)
-                        cond_node.expr_str = condition
-                        self._build_expression_tree(condition, cond_node)
-                        current_control = else_if_node
-                        pending_else = None
-                        block_node = Node("block", parent=current_control)
-                        self.total_nodes += 1
-                        stack.append(block_node)
-                        block_stack.append(block_node)
-                    else:
-                        # 处理普通 else
-                        else_node = Node("else", parent=stack[-1])
-                        self.total_nodes += 1
-                        pending_else = else_node
-                        block_node = Node("block", parent=else_node)  # 直接挂载到 else 节点
-                        self.total_nodes += 1
-                        stack.append(block_node)
-                        block_stack.append(block_node)
-                continue
-
-            # 处理代码块结束标记
-            if line.startswith('}'):
-                if block_stack:
-                    stack.pop()
-                    block_stack.pop()
-                continue
-
-            # 处理代码块开始标记 {
-            if line.endswith('{'):
-                code_part = line[:-1].strip()
-                if code_part:
-                    node = self._parse_line(code_part, stack[-1])
-                    if node and node.name in ['if', 'for', 'while', 'else if', 'switch']:
-                        current_control = node
-                # 创建块节点并指定正确的父节点（当前控制节点或栈顶节点）
-                block_parent = current_control if current_control else stack[-1]
-                block_node = Node("block", parent=block_parent)
-                self.total_nodes += 1
-                stack.append(block_node)
-                block_stack.append(block_node)
-                continue
-
-            # 解析普通行
-            self._parse_line(line, stack[-1])
-
+        # 递归下降解析函数体中的语句，只依赖token流，与换行、缩进和大括号风格无关
+        self._parse_statements(tokens, start, root)
+
+        # 冻结为紧凑数组存储
+        self.compact = self._builder.freeze()
+        self._builder = None
+        self.root = self.compact.root
+        # 建树时即计算节点签名（每个表达式只简化一次），比较阶段直接复用
+        self._node_signatures()
+        if cache_key is not None:
+            self.parse_cache.put(cache_key, self.preprocessed_code, self.total_nodes, self.compact)
         return self.root
 
-    def _parse_line(self, line, parent):
-        """解析单行代码并添加到树"""
-        line = line.strip()
-        if not line:
-            return None
-
-        # 特殊处理控制结构
-        control_structures = ['if', 'for', 'while', 'switch']
-        for ctrl in control_structures:
-            if line.startswith(ctrl):
-                return self._parse_control_structure(line, ctrl, parent)
+    def _find_main_body(self, tokens):
+        """main函数体第一个token的下标（函数体为空或找不到main时返回None）"""
+        n = len(tokens)
+        for i in range(n - 1):
+            if tokens[i] == 'main' and tokens[i + 1] == '(':
+                for j in range(i + 2, n):
+                    if tokens[j] == '{':
+                        if j + 1 < n and tokens[j + 1] != '}':
+                            return j + 1
+                        return None
+                return None
+        return None
 
-        # 处理case和default
-        if line.startswith('case'):
-            # 创建case节点
-            case_node = Node("case", parent=parent)
+    # ====================
+    # 语句解析：每个方法从下标pos开始解析，返回解析结束后的下标
+    # ====================
+    def _parse_statements(self, tokens, pos, parent):
+        """解析语句序列，直到与之配对的'}'（消耗该'}'）或token流结束"""
+        n = len(tokens)
+        while pos < n:
+            if tokens[pos] == '}':
+                return pos + 1
+            pos = self._parse_statement(tokens, pos, parent)
+        return pos
+
+    def _parse_statement(self, tokens, pos, parent):
+        """解析一条语句并添加到parent下"""
+        token = tokens[pos]
+        if token == ';':
+            # 空语句
+            return pos + 1
+        if token == '{':
+            # 独立的代码块
+            block_node = self._builder.add("block", parent)
             self.total_nodes += 1
-
-            # 提取case值
-            case_value = line[4:].strip().split(':', 1)[0].strip()
-            value_node = Node("value", parent=case_node)
-            value_node.expr_str = case_value
-            self._build_expression_tree(case_value, value_node)
-
-            return case_node
-        elif line.startswith('default:'):
-            # 创建default节点
-            default_node = Node("default", parent=parent)
+            return self._parse_statements(tokens, pos + 1, block_node)
+        if token == 'if':
+            return self._parse_if(tokens, pos, parent)
+        if token in ('for', 'while', 'switch'):
+            # 控制结构：条件 + 代码块
+            ctrl_node = self._builder.add(token, parent)
+            self.total_nodes += 1
+            pos = self._parse_condition(tokens, pos + 1, ctrl_node, split=token == 'for')
+            return self._parse_body(tokens, pos, ctrl_node)
+        if token == 'do':
+            return self._parse_do_while(tokens, pos, parent)
+        if token == 'else':
+            # 没有配对if的else（代码本身有误），仍按else处理
+            else_node = self._builder.add("else", parent)
+            self.total_nodes += 1
+            return self._parse_body(tokens, pos + 1, else_node)
+        if token == 'case':
+            # case值到':'为止
+            case_node = self._builder.add("case", parent)
             self.total_nodes += 1
-            return default_node
+            end = self._find_end(tokens, pos + 1, ':')
+            value_node = self._builder.add("value", case_node)
+            self._builder.set_expr(value_node, join_tokens(tokens[pos + 1:end]))
+            self._build_expression_tree(tokens[pos + 1:end], value_node)
+            return end + 1
+        if token == 'default' and pos + 1 < len(tokens) and tokens[pos + 1] == ':':
+            self._builder.add("default", parent)
+            self.total_nodes += 1
+            return pos + 2
+
+        # 其余为简单语句，到';'为止
+        end = self._find_end(tokens, pos, ';')
+        if end == pos:
+            # 多余的闭括号，跳过
+            return pos + 1
+        self._parse_simple_statement(tokens, pos, end, parent)
+        return end + 1 if end < len(tokens) and tokens[end] == ';' else end
+
+    def _parse_if(self, tokens, pos, parent):
+        """解析if及其后的else if/else链，各分支都是parent下的兄弟节点"""
+        n = len(tokens)
+        if_node = self._builder.add("if", parent)
+        self.total_nodes += 1
+        pos = self._parse_condition(tokens, pos + 1, if_node)
+        pos = self._parse_body(tokens, pos, if_node)
+        while pos < n and tokens[pos] == 'else':
+            if pos + 1 < n and tokens[pos + 1] == 'if':
+                # else if
+                else_if_node = self._builder.add("else if", parent)
+                self.total_nodes += 1
+                pos = self._parse_condition(tokens, pos + 2, else_if_node)
+                pos = self._parse_body(tokens, pos, else_if_node)
+            else:
+                # 普通else
+                else_node = self._builder.add("else", parent)
+                self.total_nodes += 1
+                return self._parse_body(tokens, pos + 1, else_node)
+        return pos
+
+    def _parse_do_while(self, tokens, pos, parent):
+        """do...while按while循环建树：条件 + 代码块"""
+        n = len(tokens)
+        while_node = self._builder.add("while", parent)
+        self.total_nodes += 1
+        # 条件在循环体之后，先找到循环体的结束位置
+        body_end = self._skip_statement(tokens, pos + 1)
+        if body_end < n and tokens[body_end] == 'while':
+            end = self._parse_condition(tokens, body_end + 1, while_node)
+        else:
+            end = body_end
+        self._parse_body(tokens, pos + 1, while_node)
+        if end < n and tokens[end] == ';':
+            end += 1
+        return end
+
+    def _skip_statement(self, tokens, pos):
+        """跳过一条语句（不建树），返回其后的下标"""
+        n = len(tokens)
+        if pos >= n:
+            return pos
+        if tokens[pos] == '{':
+            return self._find_close(tokens, pos) + 1
+        if tokens[pos] in ('for', 'while', 'switch'):
+            return self._skip_statement(tokens, self._find_close(tokens, pos + 1) + 1)
+        if tokens[pos] == 'if':
+            pos = self._skip_statement(tokens, self._find_close(tokens, pos + 1) + 1)
+            if pos < n and tokens[pos] == 'else':
+                pos = self._skip_statement(tokens, pos + 1)
+            return pos
+        if tokens[pos] == 'do':
+            pos = self._skip_statement(tokens, pos + 1)
+            if pos < n and tokens[pos] == 'while':
+                pos = self._find_close(tokens, pos + 1) + 1
+            return pos + 1 if pos < n and tokens[pos] == ';' else pos
+        end = self._find_end(tokens, pos, ';')
+        return end + 1 if end < n and tokens[end] == ';' else end
+
+    def _parse_body(self, tokens, pos, ctrl_node):
+        """控制结构的循环体/分支体：统一建为block节点，单条语句与加大括号的写法得到相同的树"""
+        block_node = self._builder.add("block", ctrl_node)
+        self.total_nodes += 1
+        if pos >= len(tokens):
+            return pos
+        if tokens[pos] == '{':
+            return self._parse_statements(tokens, pos + 1, block_node)
+        if tokens[pos] == '}':
+            # 缺少循环体/分支体
+            return pos
+        return self._parse_statement(tokens, pos, block_node)
+
+    def _parse_condition(self, tokens, pos, ctrl_node, split=False):
+        """解析括号中的条件，split为True时按';'拆分for的三个子句分别建表达式树"""
+        if pos < len(tokens) and tokens[pos] == '(':
+            end = self._find_close(tokens, pos)
+            inner = tokens[pos + 1:end]
+            next_pos = end + 1
+        else:
+            # 缺少括号时条件到'{'或';'为止
+            end = pos
+            while end < len(tokens) and tokens[end] not in ('{', ';'):
+                end += 1
+            inner = tokens[pos:end]
+            next_pos = end
+
+        cond_node = self._builder.add("condition", ctrl_node)
+        self._builder.set_expr(cond_node, join_tokens(inner))
+        if split:
+            for start, stop in split_top_level(inner, ';'):
+                self._build_expression_tree(inner[start:stop], cond_node)
+        else:
+            self._build_expression_tree(inner, cond_node)
+        return next_pos
+
+    def _parse_simple_statement(self, tokens, start, end, parent):
+        """解析tokens[start:end]中的简单语句（不含结尾的';'）"""
+        if start >= end:
+            return None
+        token = tokens[start]
 
-        # 其他结构的解析
-        if line.startswith('int var') or line.startswith('float var') or line.startswith('char var'):
-            # 变量声明
-            decl_node = Node("variable", parent=parent)
+        if token in self.DECLARATION_KEYWORDS:
+            # 变量声明：每个带初始化的声明符对应一个表达式子节点
+            decl_node = self._builder.add("variable", parent)
             self.total_nodes += 1
-            # 处理初始化
-            if '=' in line:
-                expr = line.split('=', 1)[1].strip()
-                expr = expr.rstrip(';')
-                expr_node = Node("expression", parent=decl_node)
-                expr_node.expr_str = expr
-                self._build_expression_tree(expr, expr_node)
+            for lo, hi in split_top_level(tokens[start:end], ','):
+                declarator = tokens[start + lo:start + hi]
+                bounds = split_top_level(declarator, '=', maxsplit=1)
+                if len(bounds) == 2:
+                    initializer = declarator[bounds[1][0]:]
+                    expr_node = self._builder.add("expression", decl_node)
+                    self._builder.set_expr(expr_node, join_tokens(initializer))
+                    self._build_expression_tree(initializer, expr_node)
             return decl_node
-        elif line.startswith('printf') or line.startswith('scanf'):
+        if token in ('printf', 'scanf') and start + 1 < end and tokens[start + 1] == '(':
             # 输入输出语句
-            io_node = Node("sentence", parent=parent)
+            io_node = self._builder.add("sentence", parent)
             self.total_nodes += 1
-            io_type = "printf" if line.startswith('printf') else "scanf"
-            Node(io_type, parent=io_node)
-            # 提取参数
-            args = line.split('(', 1)[1].rsplit(')', 1)[0]
-            for arg in args.split(','):
-                arg = arg.strip().strip('"')
+            self._builder.add(token, io_node)
+            close = self._find_close(tokens, start + 1)
+            args = tokens[start + 2:close]
+            for lo, hi in split_top_level(args, ','):
+                arg = join_tokens(args[lo:hi]).strip('"')
                 if arg:
-                    Node(f"arg: {arg}", parent=io_node)
+                    self._builder.add(f"arg: {arg}", io_node)
             return io_node
-        elif line.startswith('break') or line.startswith('continue'):
+        if token in ('break', 'continue'):
             # 跳转语句
-            stmt_node = Node("sentence", parent=parent)
+            stmt_node = self._builder.add("sentence", parent)
             self.total_nodes += 1
-            line = line.rstrip(';')
-            Node(line, parent=stmt_node)
+            self._builder.add(token, stmt_node)
             return stmt_node
-        elif line.startswith('return'):
+        if token == 'return':
             # return语句
-            return_node = Node("return", parent=parent)  # 直接挂到根节点
+            return_node = self._builder.add("return", parent)
             self.total_nodes += 1
-            expr = line[6:].strip()
-            if expr:
-                expr = expr.rstrip(';')
-                expr_node = Node("expression", parent=return_node)
-                expr_node.expr_str = expr
-                self._build_expression_tree(expr, expr_node)
+            if end > start + 1:
+                expr_node = self._builder.add("expression", return_node)
+                self._builder.set_expr(expr_node, join_tokens(tokens[start + 1:end]))
+                self._build_expression_tree(tokens[start + 1:end], expr_node)
             return return_node
-        else:
-            # 表达式语句
-            expr_node = Node("expression", parent=parent)
-            self.total_nodes += 1
-            line = line.rstrip(';')
-            expr_node.expr_str = line
-            self._build_expression_tree(line, expr_node)
-            return expr_node
-
-    def _parse_control_structure(self, line, ctrl, parent):
-        """解析控制结构（if, for, while, switch）"""
-        if ctrl == 'switch':
-            # 提取switch条件部分
-            cond_start = line.find('(')
-            cond_end = line.rfind(')')
-            if cond_start == -1 or cond_end == -1:
-                return None
-
-            condition = line[cond_start + 1:cond_end].strip()
-
-            # 创建switch节点
-            switch_node = Node("switch", parent=parent)
-            self.total_nodes += 1
-
-            # 条件部分
-            cond_node = Node("condition", parent=switch_node)
-            cond_node.expr_str = condition
-            self._build_expression_tree(condition, cond_node)
-
-            # 创建switch的代码块节点
-            block_node = Node("block", parent=switch_node)
-            self.total_nodes += 1
 
-            return switch_node
-        else:
-            # if/for/while的解析
-            cond_start = line.find('(')
-            cond_end = line.rfind(')')
-            if cond_start == -1 or cond_end == -1:
-                # 尝试匹配没有括号的情况
-                pattern = r'^(if|for|while)\s+(.+?)\s*(?:\{|$)'
-                match = re.match(pattern, line)
-                if not match:
-                    return None
-                condition = match.group(2)
-            else:
-                condition = line[cond_start + 1:cond_end].strip()
-
-            # 创建控制结构节点
-            ctrl_node = Node(ctrl, parent=parent)
-            self.total_nodes += 1
-
-            # 条件部分
-            cond_node = Node("condition", parent=ctrl_node)
-            cond_node.expr_str = condition
-            self._build_expression_tree(condition, cond_node)
-
-            return ctrl_node
+        # 表达式语句
+        expr_node = self._builder.add("expression", parent)
+        self.total_nodes += 1
+        self._builder.set_expr(expr_node, join_tokens(tokens[start:end]))
+        self._build_expression_tree(tokens[start:end], expr_node)
+        return expr_node
+
+    def _find_close(self, tokens, pos):
+        """tokens[pos]为开括号，返回与之配对的闭括号下标（未闭合时返回len(tokens)）"""
+        depth = 0
+        for i in range(pos, len(tokens)):
+            token = tokens[i]
+            if token in OPEN_BRACKETS:
+                depth += 1
+            elif token in CLOSE_BRACKETS:
+                depth -= 1
+                if depth == 0:
+                    return i
+        return len(tokens)
+
+    def _find_end(self, tokens, pos, stop):
+        """从pos开始第一个不在括号内的stop下标；遇到多余的'}'或token流结束时提前返回"""
+        depth = 0
+        pending = 0  # 尚未配对':'的'?'个数（三目运算符）
+        for i in range(pos, len(tokens)):
+            token = tokens[i]
+            if token in OPEN_BRACKETS:
+                depth += 1
+            elif token in CLOSE_BRACKETS:
+                if depth == 0:
+                    return i
+                depth -= 1
+            elif depth == 0:
+                if token == '?':
+                    pending += 1
+                elif token == ':' and pending:
+                    pending -= 1
+                elif token == stop:
+                    return i
+        return len(tokens)
 
     # 答辩点 3
-    def _build_expression_tree(self, expr, parent):
-        """构建表达式二叉树"""
-        tokens = self._tokenize_expression(expr)
-        if not tokens:
-            return
-
-        # 使用输出栈构建树
-        output = [] # 存储后缀表达式
-        ops = [] # 运算符栈
-
-        # Shunting-yard算法
-        for token in tokens:
-            if token == '(':
-                ops.append(token)
-            elif token == ')':
-                while ops and ops[-1] != '(':
-                    output.append(ops.pop())
-                if ops and ops[-1] == '(':
-                    ops.pop()  # 移除左括号
-            elif token in self.OPERATOR_PRECEDENCE:
-                # 处理运算符优先级
-                while (ops and ops[-1] != '(' and
-                       self.OPERATOR_PRECEDENCE.get(ops[-1], 0) >= self.OPERATOR_PRECEDENCE.get(token, 0)):
-                    output.append(ops.pop())
-                ops.append(token)
-            else:
-                # 操作数
-                output.append(token)
-
-        # 处理剩余运算符
-        while ops:
-            output.append(ops.pop())
-
-        # 使用后缀表达式构建表达式树
-        stack = [] # 表达式节点栈
-        for token in output:
-            if token in self.OPERATOR_PRECEDENCE:
-                # 运算符节点
-                right = stack.pop()
-                left = stack.pop()
-                op_node = Node(token, parent=parent)
-                # 添加为操作数的父节点
-                left.parent = op_node
-                right.parent = op_node
-                stack.append(op_node)
-            else:
-                # 操作数节点
-                node = Node(token, parent=parent)
-                stack.append(node)
+    def _build_expression_tree(self, tokens, parent):
+        """构建表达式树：Pratt解析得到语法树后自顶向下建节点，每个节点创建时即挂在最终的父节点下"""
+        stack = [(node, parent) for node in reversed(parse_expression(tokens))]
+        while stack:
+            (label, children), node_parent = stack.pop()
+            index = self._builder.add(label, node_parent)
+            # 逆序入栈，保证子节点按原顺序创建
+            for child in reversed(children):
+                stack.append((child, index))
 
         """
         eg:
             中缀表达式："(a + b) * c"
-            后缀表达式：['a', 'b', '+', 'c', '*']
+            语法树：('*', (('+', (('var', ()), ('var', ()))), ('var', ())))
         """
 
-    def _tokenize_expression(self, expr):
-        """将表达式拆分为token"""
-        tokens = []
-        current = ''
-        i = 0
-        n = len(expr)
-
-        while i < n:
-            c = expr[i]
-            # 处理空格：作为token分隔符
-            if c.isspace():
-                if current:
-                    tokens.append(current)
-                    current = ''
-                i += 1
-                continue
-
-            # 处理运算符
-            if c in '+-*/%=!<>&|^':
-                if current:
-                    tokens.append(current)
-                    current = ''
-
-                # 处理复合运算符
-                if i < n - 1:
-                    two_chars = c + expr[i + 1]
-                    if two_chars in ('==', '!=', '<=', '>=', '+=', '-=', '*=', '/=', '&&', '||'):
-                        tokens.append(two_chars)
-                        i += 2
-                        continue
-
-                tokens.append(c)
-                i += 1
-                continue
-
-            # 处理括号
-            if c in '()':
-                if current:
-                    tokens.append(current)
-                    current = ''
-                tokens.append(c)
-                i += 1
-                continue
-
-            # 处理其他字符（变量、数字等）
-            current += c
-            i += 1
-
-        if current:
-            tokens.append(current)
-
-        return tokens
-
     def visualize_tree(self, filename="code_tree"):
         """可视化代码树"""
         if not self.root:
             raise ValueError("树未构建")
 
-        # 使用graphviz可视化
+        # 使用graphviz可视化（按需导入，命令行批处理模式无需安装graphviz）
+        import graphviz
         dot = graphviz.Digraph(comment='Code Tree', format='png')
         dot.attr('node', shape='box', style='rounded,filled', fillcolor='#f0f0f0')
 
-        # 添加节点
-        node_queue = deque([(self.root, str(id(self.root)))]) # 使用deque作为广度优先遍历(BFS)的队列
-        dot.node(str(id(self.root)), "main")
+        # 添加节点：紧凑树的先序下标即可作为graphviz节点ID
+        tree = self.compact
+        dot.node("0", "main")
 
-        while node_queue:
-            current_node, current_id = node_queue.popleft() # 获取当前节点及其ID
-            for child in current_node.children:
-                child_id = str(id(child))
-                label = child.name
+        for index in tree.iter_bfs(): # 广度优先遍历(BFS)
+            for child in tree.children(index):
+                child_id = str(child)
+                name = tree.name(child)
+                label = name
 
                 # 对于表达式节点，显示整个表达式
-                if hasattr(child, 'expr_str'):
-                    expr_str = child.expr_str
+                expr_str = tree.expr(child)
+                if expr_str is not None:
                     # 截断过长的表达式
                     if len(expr_str) > 30:
                         expr_str = expr_str[:27] + "..."
-                    label = f"{child.name}\n{expr_str}"
-                elif child.name == "expression" and not child.children:
+                    label = f"{name}\n{expr_str}"
+                elif name == "expression" and tree.first_child[child] == -1:
                     # 空表达式节点
                     label = "expression"
 
                 # 控制结构节点使用不同颜色
-                if child.name in ['if', 'else if', 'for', 'while', 'else', 'switch']:
+                if name in ['if', 'else if', 'for', 'while', 'else', 'switch']:
                     dot.node(child_id, label, fillcolor='#d0e0f0')
-                elif child.name == 'variable':
+                elif name == 'variable':
                     dot.node(child_id, label, fillcolor='#f0d0d0')
-                elif child.name == 'sentence':
+                elif name == 'sentence':
                     dot.node(child_id, label, fillcolor='#d0f0d0')
                 else:
                     dot.node(child_id, label)
 
                 # 添加边（父子关系）
-                dot.edge(current_id, child_id)
-                node_queue.append((child, child_id))
+                dot.edge(str(index), child_id)
 
         # 保存并渲染
         dot.render(filename, format='png', cleanup=True)
@@ -638,22 +684,23 @@ class CodeTree:
             return ""
 
         output = StringIO() # 内存缓冲区
+        tree = self.compact
         """
-        RenderTree:anytree库的树遍历工具
+        render:与anytree.RenderTree格式相同的树遍历
         pre: 当前节点的前缀字符串
         fill: 填充字符(用于子节点)
-        node: 当前节点对象
+        index: 当前节点在紧凑树中的下标
         """
-        for pre, fill, node in RenderTree(self.root):
+        for pre, fill, index in tree.render():
             # 添加表达式信息
-            if hasattr(node, 'expr_str'):
-                expr_str = node.expr_str
+            expr_str = tree.expr(index)
+            if expr_str is not None:
                 # 截断过长的表达式
                 if len(expr_str) > 30:
                     expr_str = expr_str[:27] + "..."
-                node_repr = f"{node.name} ({expr_str})"
+                node_repr = f"{tree.name(index)} ({expr_str})"
             else:
-                node_repr = node.name
+                node_repr = tree.name(index)
             output.write(f"{pre}{node_repr}\n")
 
         return output.getvalue()
@@ -661,13 +708,8 @@ class CodeTree:
     # 答辩点 4
     def _get_all_nodes(self, node):
         """获取所有节点（包括根节点和叶子节点）BFS算法"""
-        nodes = []
-        stack = [node]
-        while stack:
-            current = stack.pop(0)
-            nodes.append(current)
-            stack.extend(current.children) # 将当前节点的所有子节点加入队列尾部
-        return nodes
+        tree = node.tree
+        return [tree.node(index) for index in tree.iter_bfs(node.index)]
 
     def _is_node_similar(self, node1, node2):
         """检查两个节点是否相似"""
@@ -676,7 +718,7 @@ class CodeTree:
             return False
 
         # 对于控制结构和表达式节点需要特殊处理
-        if node1.name in ['if', 'else if', 'for', 'while', 'expression', 'condition', 'else']:
+        if node1.name in self.STRUCTURAL_NODES:
             # 比较子节点结构
             if len(node1.children) != len(node2.children):
                 return False
@@ -710,27 +752,213 @@ class CodeTree:
 
     def _simplify_expression(self, expr):
         """简化表达式，忽略操作数具体值"""
-        # 移除所有空格
-        expr = expr.replace(" ", "")
-        # 标准化运算符
-        expr = expr.replace("!=", "≠").replace("==", "=")
-        # 将变量名替换为"var"
-        expr = re.sub(r'\bvar\b', 'var', expr)
-        # 将数值替换为"#"
-        expr = re.sub(r'\b\d+(\.\d+)?\b', '#', expr)
-        # 将字符串替换为"str"
-        expr = re.sub(r'".*?"', 'str', expr)
-        return expr
+        return simplify_expression(expr)
+
+    def _node_signatures(self):
+        """按BFS顺序为每个节点计算一次相似性签名，驻留为整数id后存放在紧凑树上
+
+        返回(BFS顺序, 签名id)两个数组。签名相同即满足_is_node_similar；
+        签名id为-1的节点只要求名称相同且深度差不超过2。
+        紧凑树被缓存和多个CodeTree共享，签名随之只计算一次
+        """
+        tree = self.compact
+        if tree.signatures is None:
+            order = array('i', tree.iter_bfs())
+            signatures = array('i', [-1]) * len(order)
+            for pos, index in enumerate(order):
+                name = tree.name(index)
+                if name in self.STRUCTURAL_NODES:
+                    # 子节点数量 + 简化后的表达式
+                    expr = tree.expr(index)
+                    simplified = self._simplify_expression(expr) if expr is not None else None
+                    signatures[pos] = SIGNATURES.intern((name, tree.child_count(index), simplified))
+                elif name == 'variable':
+                    signatures[pos] = SIGNATURES.intern((name,))
+                elif name == 'sentence':
+                    # IO类型(printf/scanf)
+                    child = tree.first_child[index]
+                    signatures[pos] = SIGNATURES.intern((name, tree.name(child) if child != -1 else None))
+            tree.bfs_order = order
+            tree.signatures = signatures
+        return tree.bfs_order, tree.signatures
+
+    def pq_profile(self, p=2, q=3):
+        """pq-gram轮廓（升序哈希数组），每棵树每组参数只计算一次"""
+        profile = self._profiles.get((p, q))
+        if profile is None:
+            profile = self._profiles[(p, q)] = pqgram.profile(self.compact, p, q)
+        return profile
 
     # 答辩点 5
-    def calculate_similarity(self, other):
-        """计算代码重复率 - 使用公式 (2*匹配节点数)/(总节点数)"""
+    def calculate_similarity(self, other, mode='bucket', max_distance=None):
+        """计算代码重复率 - 使用公式 (2*匹配节点数)/(总节点数)
+
+        参数:
+            other (CodeTree): 另一个代码树对象
+            mode (str): 'bucket' 按签名分桶匹配，O(n+m)；
+                        'greedy' 原始的逐对贪心匹配，O(n·m)，结果与bucket一致；
+                        'ted' 有序树编辑距离，重复率为 max(0, 1 - 距离/max(n, m))，考虑节点位置；
+                        'pqgram' pq-gram轮廓相似度 1 - pq-gram距离，每对O(n+m)；
+                        'optimal' 桶内二分图最大匹配（Hopcroft–Karp），与遍历顺序无关；
+                        'weighted' 桶内最大权匹配，深度差越大的节点对权重越低；
+                        'lcs' 先序标签序列的最长公共子序列 2*LCS/(n+m)，位并行计算；
+                        'kernel' 归一化的子集树核，按共有树片段计分；
+                        'idf' 按子树哈希计数，以CodeTree.corpus_stats中的文档频率做IDF加权
+            max_distance (int): 仅用于'ted'，编辑距离超过该值时直接返回0.0
+
+        设置了CodeTree.template时只支持TEMPLATE_MODES中的模式，其余模式抛出ValueError
+        """
+        if self.template is not None and mode not in self.TEMPLATE_MODES:
+            raise ValueError(f"'{mode}'模式不支持教师模板")
         if not self.root or not other.root:
             return 0.0
 
+        if mode == 'ted':
+            # 按需导入：编辑距离依赖numpy
+            from ted import tree_edit_distance
+            distance = tree_edit_distance(self.compact, other.compact, max_distance)
+            if distance is None:
+                return 0.0
+            # 编辑距离可能超过较大树的节点数（如先删除再插入），此时重复率记为0
+            return max(0.0, 1.0 - distance / max(len(self.compact), len(other.compact)))
+
+        if mode == 'kernel':
+            return normalized_kernel(self.compact, other.compact)
+
+        if mode == 'lcs':
+            return lcs_similarity(self.compact.labels, other.compact.labels)
+
+        if mode == 'idf':
+            if self.corpus_stats is None:
+                raise ValueError("'idf'模式需要先设置CodeTree.corpus_stats")
+            excluded1 = excluded2 = ()
+            if self.template is not None:
+                excluded1, excluded2 = self._excluded_nodes(), other._excluded_nodes(self.template)
+            return self.corpus_stats.weighted_similarity(self.compact, other.compact, excluded1, excluded2)
+
+        if mode == 'pqgram':
+            return 1.0 - pqgram.distance(self.pq_profile(), other.pq_profile())
+
+        if mode == 'bucket':
+            matched_count = self._count_bucket_matches(other)
+        elif mode == 'greedy':
+            matched_count = self._count_greedy_matches(other)
+        elif mode == 'optimal':
+            matched_count = self._count_optimal_matches(other)
+        elif mode == 'weighted':
+            matched_count = self._count_optimal_matches(other, weighted=True)
+        else:
+            raise ValueError(f"未知的相似度模式: {mode}")
+
+        # 应用公式: (2 * matched_count) / (total_nodes)
+        total_nodes = len(self.compact) + len(other.compact)
+        if self.template is not None:
+            total_nodes -= len(self._excluded_nodes()) + len(other._excluded_nodes(self.template))
+        if total_nodes == 0:
+            return 0.0
+
+        similarity = (2 * matched_count) / total_nodes
+        return min(similarity, 1.0)  # 确保不超过100%
+
+    def _excluded_nodes(self, template=None):
+        """属于模板的节点下标集合（默认使用self.template）"""
+        template = template or self.template
+        if template is None:
+            return frozenset()
+        return template.excluded(self.compact)
+
+    def _active_signatures(self, template=None):
+        """按BFS顺序产生参与匹配的节点的(签名id, 标签id, 深度)，跳过属于模板的节点"""
+        order, signatures = self._node_signatures()
+        labels = self.compact.labels
+        depths = self.compact.depths
+        excluded = self._excluded_nodes(template)
+        for index, sig in zip(order, signatures):
+            if index not in excluded:
+                yield sig, labels[index], depths[index]
+
+    def _count_bucket_matches(self, other):
+        """按签名把other的节点分桶，匹配数即两棵树签名多重集的交集大小"""
+        sig_counts = {} # 签名 -> other中剩余可匹配的节点数
+        depth_counts = {} # (名称, 深度) -> other中剩余可匹配的节点数
+        for sig, name, depth in other._active_signatures(self.template):
+            if sig < 0:
+                key = (name, depth)
+                depth_counts[key] = depth_counts.get(key, 0) + 1
+            else:
+                sig_counts[sig] = sig_counts.get(sig, 0) + 1
+
+        matched_count = 0
+        for sig, name, depth in self._active_signatures():
+            if sig < 0:
+                # BFS顺序下深度单调不减，取深度最小的非空桶即等价于贪心算法中"第一个"可匹配节点
+                for d in range(depth - 2, depth + 3):
+                    key = (name, d)
+                    if depth_counts.get(key, 0) > 0:
+                        depth_counts[key] -= 1
+                        matched_count += 1
+                        break
+            elif sig_counts.get(sig, 0) > 0:
+                sig_counts[sig] -= 1
+                matched_count += 1
+        return matched_count
+
+    def _count_optimal_matches(self, other, weighted=False):
+        """在每个签名桶内求最大匹配，结果与节点遍历顺序无关
+
+        有签名的节点两两等价，桶内最大匹配就是两边数量的较小者；
+        无签名的节点按名称分桶，深度差不超过2的节点之间连边后求二分图最大匹配。
+        weighted为True时边权为 1 - 深度差/3，按深度归类后求最大权运输问题，返回值为权重之和
+        """
+        sig_counts = {} # 签名 -> [self中的数量, other中的数量]
+        depths = {} # 名称 -> ([self中节点的深度], [other中节点的深度])
+        for side, tree in enumerate((self, other)):
+            for sig, name, depth in tree._active_signatures(self.template):
+                if sig < 0:
+                    depths.setdefault(name, ([], []))[side].append(depth)
+                else:
+                    sig_counts.setdefault(sig, [0, 0])[side] += 1
+
+        matched_count = sum(min(counts) for counts in sig_counts.values())
+        for depths1, depths2 in depths.values():
+            if not depths1 or not depths2:
+                continue
+            if weighted:
+                # 边权只取决于深度差，同名同深度的节点可以互换：按深度归类后求运输问题，
+                # 规模只与不同深度的个数有关（var等叶子桶有上千个节点，但深度只有几十种）
+                counts1, counts2 = {}, {}
+                for depth in depths1:
+                    counts1[depth] = counts1.get(depth, 0) + 1
+                for depth in depths2:
+                    counts2[depth] = counts2.get(depth, 0) + 1
+                classes1, classes2 = sorted(counts1), sorted(counts2)
+                weights = {(i, j): 1.0 - abs(d1 - d2) / 3.0
+                           for i, d1 in enumerate(classes1) for j, d2 in enumerate(classes2) if abs(d1 - d2) <= 2}
+                matched_count += max_weight_transport([counts1[d] for d in classes1],
+                                                      [counts2[d] for d in classes2], weights)
+            else:
+                by_depth = {} # 深度 -> other中该深度的节点编号
+                for j, depth in enumerate(depths2):
+                    by_depth.setdefault(depth, []).append(j)
+                # 同一深度的节点共享一份邻接表
+                neighbours = {}
+                for depth in set(depths1):
+                    neighbours[depth] = [j for d in range(depth - 2, depth + 3) for j in by_depth.get(d, ())]
+                adjacency = [neighbours[depth] for depth in depths1]
+                match = hopcroft_karp(adjacency, len(depths2))
+                matched_count += sum(1 for j in match if j != -1)
+        return matched_count
+
+    def _count_greedy_matches(self, other):
+        """逐对比较节点的贪心匹配"""
         # 获取所有节点
         all_nodes_self = self._get_all_nodes(self.root)
         all_nodes_other = other._get_all_nodes(other.root)
+        if self.template is not None:
+            excluded_self = self._excluded_nodes()
+            excluded_other = other._excluded_nodes(self.template)
+            all_nodes_self = [node for node in all_nodes_self if node.index not in excluded_self]
+            all_nodes_other = [node for node in all_nodes_other if node.index not in excluded_other]
 
         # 记录已匹配的节点
         matched_self = set()
@@ -746,52 +974,29 @@ class CodeTree:
                         matched_other.add(j)
                         matched_count += 1
                         break
-
-        # 应用公式: (2 * matched_count) / (total_nodes)
-        total_nodes = len(all_nodes_self) + len(all_nodes_other)
-        if total_nodes == 0:
-            return 0.0
-
-        similarity = (2 * matched_count) / total_nodes
-        return min(similarity, 1.0)  # 确保不超过100%
+        return matched_count
 
     def _get_all_subtrees(self, node, min_nodes=3):
         """获取节点数至少为min_nodes的子树"""
-        subtrees = [] # 存储符合条件的子树根节点
-        # 计算以该节点为根的子树节点数
-        count = self._count_nodes(node)
-        if count >= min_nodes:
-            subtrees.append(node)
-        for child in node.children:
-            subtrees.extend(self._get_all_subtrees(child, min_nodes)) # 深度优先遍历(DFS)
-        return subtrees
+        # 紧凑树按先序编号，子树正好是连续区间，直接读取预存的子树大小
+        tree = node.tree
+        sizes = tree.sizes
+        start = node.index
+        return [tree.node(index) for index in range(start, start + sizes[start]) if sizes[index] >= min_nodes]
 
     # 答辩点 6
     def _count_nodes(self, node):
-        """计算子树节点数"""
-        # 广度优先遍历(BFS)
-        stack = [node]
-        count = 0
-        while stack:
-            current = stack.pop(0)
-            count += 1
-            stack.extend(current.children)
-        return count
+        """计算子树节点数（建树时已预存）"""
+        return node.size
 
     # 答辩点 7
     def _is_subtree_similar(self, node1, node2):
-        """检查两个子树是否结构相似（DFS算法）"""
-        # 1. 节点名称检查
-        if node1.name != node2.name:
-            return False
-        # 2. 子节点数量检查
-        if len(node1.children) != len(node2.children):
-            return False
-        # 3. 递归检查子节点
-        for child1, child2 in zip(node1.children, node2.children):
-            if not self._is_subtree_similar(child1, child2):
-                return False
-        return True
+        """检查两个子树是否结构相似
+
+        建树时已自底向上计算了结构哈希（节点名称 + 各子节点哈希），
+        名称、子节点数量和子节点结构都相同的子树哈希相同，比较一个整数即可
+        """
+        return node1.structure_hash == node2.structure_hash
 
     def find_similar_subtrees(self, other, min_similarity=0.6):
         """查找相似的子树
@@ -811,29 +1016,85 @@ class CodeTree:
         similar_pairs = []
         self_subtrees = self._get_all_subtrees(self.root, min_nodes=3)
         other_subtrees = self._get_all_subtrees(other.root, min_nodes=3)
+        if self.template is not None:
+            # 模板中出现过的子树不算相似
+            excluded_self = self._excluded_nodes()
+            excluded_other = other._excluded_nodes(self.template)
+            self_subtrees = [st for st in self_subtrees if st.index not in excluded_self]
+            other_subtrees = [st for st in other_subtrees if st.index not in excluded_other]
+
+        # 3. 按结构哈希分组，只有哈希相同的子树对才是候选
+        groups = {}
+        for st2 in other_subtrees:
+            groups.setdefault(st2.structure_hash, []).append(st2)
 
-        # 3. 遍历所有子树对
         for st1 in self_subtrees:
-            for st2 in other_subtrees:
-                if self._is_subtree_similar(st1, st2):
-                    # 计算子树相似度分数
-                    score = self._calculate_subtree_similarity(st1, st2)
-                    if score >= min_similarity:
-                        similar_pairs.append((st1, st2, score))
+            for st2 in groups.get(st1.structure_hash, ()):
+                # 计算子树相似度分数
+                score = self._calculate_subtree_similarity(st1, st2)
+                if score >= min_similarity:
+                    similar_pairs.append((st1, st2, score))
 
         # 按相似度分数排序
         similar_pairs.sort(key=lambda x: x[2], reverse=True) # 降序
         return similar_pairs
 
+    def iter_similar_subtrees(self, other, min_similarity=0.6, min_nodes=3):
+        """按结构哈希分组查找相似子树，只产生极大匹配
+
+        从大到小处理各哈希组，组内的子树一对一配对；已报告的子树对覆盖其全部后代，
+        被覆盖的子树不再参与配对。每个节点至多被覆盖一次，总时间O((n+m)log(n+m))，
+        报告的子树对不超过min(n, m)个。
+        结果按子树大小降序惰性产生，每个元素为(st1, st2, score)元组
+        """
+        if not self.root or not other.root:
+            return
+
+        tree1 = self.compact
+        tree2 = other.compact
+        excluded1 = self._excluded_nodes()
+        excluded2 = other._excluded_nodes(self.template)
+
+        # 1. 按结构哈希对other的子树分组（模板中出现过的子树除外）
+        groups = {}
+        for index in range(len(tree2)):
+            if tree2.sizes[index] >= min_nodes and index not in excluded2:
+                groups.setdefault(tree2.hashes[index], []).append(index)
+
+        # 2. 收集self中哈希能命中的子树
+        candidates = {}
+        for index in range(len(tree1)):
+            structure_hash = tree1.hashes[index]
+            if tree1.sizes[index] >= min_nodes and structure_hash in groups and index not in excluded1:
+                candidates.setdefault(structure_hash, []).append(index)
+
+        # 3. 先报告大的匹配；组内按先序一对一配对，已在更大匹配中的子树跳过
+        covered1 = bytearray(len(tree1))
+        covered2 = bytearray(len(tree2))
+        order = sorted(candidates, key=lambda h: tree1.sizes[candidates[h][0]], reverse=True)
+        for structure_hash in order:
+            size = tree1.sizes[candidates[structure_hash][0]]
+            free1 = [i for i in candidates[structure_hash] if not covered1[i]]
+            free2 = [j for j in groups[structure_hash] if not covered2[j]]
+            for i, j in zip(free1, free2):
+                st1, st2 = tree1.node(i), tree2.node(j)
+                score = self._calculate_subtree_similarity(st1, st2)
+                if score < min_similarity:
+                    continue
+                # 子树在先序编号下是连续区间，整段标记为已覆盖
+                covered1[i:i + size] = b'\x01' * size
+                covered2[j:j + size] = b'\x01' * size
+                yield st1, st2, score
+
     def _calculate_subtree_similarity(self, node1, node2):
         """计算两棵子树的相似度分数（0.0~1.0）"""
         # 1. 结构相似性检查
         if not self._is_subtree_similar(node1, node2):
             return 0.0
 
-        # 计算节点匹配比例
-        total_nodes = min(self._count_nodes(node1), self._count_nodes(node2))
-        matched_nodes = self._count_matched_nodes(node1, node2)
+        # 计算节点匹配比例：结构一致时两棵子树的全部节点都能匹配，无需再次遍历
+        total_nodes = min(node1.size, node2.size)
+        matched_nodes = node1.size
         return matched_nodes / total_nodes if total_nodes > 0 else 0.0
 
     # 答辩点 8
@@ -1017,4 +1278,5 @@ class CodeTree:
             lines.insert(line_number - 1, indented_code)
 
         self.source_code = "\n".join(lines)
+        # 重新建树，子树大小、高度和结构哈希随之重新计算
         return self.build_tree(self.source_code)
\ No newline at end of file
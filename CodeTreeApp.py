@@ -725,7 +725,8 @@ class CodeTreeApp(tk.Tk):
             return
 
         try:
-            similar_subtrees = self.tree1.find_similar_subtrees(self.tree2)
+            # 只显示极大匹配，避免嵌套子树对刷屏
+            similar_subtrees = list(self.tree1.iter_similar_subtrees(self.tree2))
             if not similar_subtrees:
                 self.log_message("未找到相似子树")
                 return
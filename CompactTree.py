@@ -0,0 +1,338 @@
+import json  # 序列化头部
+import struct  # 序列化长度前缀
+from array import array  # 紧凑的定长数值数组
+from hashlib import blake2b  # 稳定的结构哈希（跨进程一致）
+
+# ====================
+# 紧凑树存储：用并行数组代替每个节点一个对象
+# ====================
+
+
+class LabelTable:
+    """字符串驻留表：把节点标签/表达式字符串映射为整数id"""
+
+    def __init__(self):
+        self._ids = {}  # 字符串 -> id
+        self._strings = []  # id -> 字符串
+        self._hashes = []  # id -> 稳定哈希（按需计算）
+
+    def intern(self, text):
+        """返回字符串对应的id，不存在时新建"""
+        idx = self._ids.get(text)
+        if idx is None:
+            idx = len(self._strings)
+            self._ids[text] = idx
+            self._strings.append(text)
+        return idx
+
+    def lookup(self, idx):
+        """根据id取回字符串"""
+        return self._strings[idx]
+
+    def hash_of(self, idx):
+        """字符串的64位稳定哈希（与进程内id无关）"""
+        while len(self._hashes) <= idx:
+            text = self._strings[len(self._hashes)]
+            self._hashes.append(int.from_bytes(blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little'))
+        return self._hashes[idx]
+
+    def __len__(self):
+        return len(self._strings)
+
+
+# 进程内共享的驻留表，所有树的标签和表达式共用同一套id
+LABELS = LabelTable()
+EXPRS = LabelTable()
+# 节点相似性签名（元组）的驻留表
+SIGNATURES = LabelTable()
+
+
+def combine_hash(label_hash, child_hashes):
+    """Merkle式组合：节点标签哈希 + 按顺序排列的子节点哈希"""
+    data = array('Q', [label_hash])
+    data.extend(child_hashes)
+    return int.from_bytes(blake2b(data.tobytes(), digest_size=8).digest(), 'little')
+
+
+class TreeBuilder:
+    """建树缓冲区：build_tree期间追加节点，完成后冻结为CompactTree"""
+
+    def __init__(self):
+        self.labels = []  # 节点标签id
+        self.children = []  # 子节点编号列表
+        self.exprs = []  # 表达式字符串id（-1表示无）
+
+    def add(self, name, parent=-1):
+        """新建节点并挂到parent下，返回节点编号"""
+        idx = len(self.labels)
+        self.labels.append(LABELS.intern(name))
+        self.children.append([])
+        self.exprs.append(-1)
+        if parent >= 0:
+            self.children[parent].append(idx)
+        return idx
+
+    def name(self, idx):
+        """节点标签"""
+        return LABELS.lookup(self.labels[idx])
+
+    def set_expr(self, idx, expr):
+        """为节点记录表达式字符串"""
+        self.exprs[idx] = EXPRS.intern(expr)
+
+    def freeze(self, root=0):
+        """按先序重新编号并生成紧凑数组"""
+        order = []  # 先序遍历得到的旧编号序列
+        stack = [root]
+        while stack:
+            idx = stack.pop()
+            order.append(idx)
+            stack.extend(reversed(self.children[idx]))
+
+        new_index = {old: new for new, old in enumerate(order)}
+        n = len(order)
+        labels = array('i', (self.labels[old] for old in order))
+        exprs = array('i', (self.exprs[old] for old in order))
+        parents = array('i', [-1]) * n
+        first_child = array('i', [-1]) * n
+        next_sibling = array('i', [-1]) * n
+        sizes = array('i', [1]) * n
+
+        for new, old in enumerate(order):
+            kids = self.children[old]
+            if kids:
+                first_child[new] = new_index[kids[0]]
+                for a, b in zip(kids, kids[1:]):
+                    next_sibling[new_index[a]] = new_index[b]
+                for kid in kids:
+                    parents[new_index[kid]] = new
+
+        # 先序中父节点总在子节点之前：正向一遍得到深度
+        depths = array('i', [0]) * n
+        for idx in range(1, n):
+            depths[idx] = depths[parents[idx]] + 1
+
+        # 逆先序一遍（相当于后序）累加子树大小与高度，并自底向上计算结构哈希
+        heights = array('i', [0]) * n
+        hashes = array('Q', [0]) * n
+        for idx in range(n - 1, -1, -1):
+            child_hashes = []
+            child = first_child[idx]
+            while child != -1:
+                child_hashes.append(hashes[child])
+                child = next_sibling[child]
+            hashes[idx] = combine_hash(LABELS.hash_of(labels[idx]), child_hashes)
+            if idx == 0:
+                break
+            parent = parents[idx]
+            sizes[parent] += sizes[idx]
+            if heights[idx] + 1 > heights[parent]:
+                heights[parent] = heights[idx] + 1
+
+        return CompactTree(labels, parents, first_child, next_sibling, sizes, exprs, depths, heights, hashes)
+
+
+class CompactTree:
+    """以先序编号存储的代码树，子树i占据区间[i, i+size[i])"""
+
+    # 序列化时数组的存放顺序与类型
+    ARRAY_FIELDS = (
+        ('parents', 'i'), ('first_child', 'i'), ('next_sibling', 'i'), ('sizes', 'i'),
+        ('depths', 'i'), ('heights', 'i'), ('hashes', 'Q'),
+    )
+
+    def __init__(self, labels, parents, first_child, next_sibling, sizes, exprs, depths, heights, hashes):
+        self.labels = labels  # 标签id
+        self.parents = parents  # 父节点下标
+        self.first_child = first_child  # 第一个子节点下标
+        self.next_sibling = next_sibling  # 下一个兄弟节点下标
+        self.sizes = sizes  # 子树节点数
+        self.exprs = exprs  # 表达式字符串id
+        self.depths = depths  # 节点深度（根为0）
+        self.heights = heights  # 子树高度（叶子为0）
+        self.hashes = hashes  # 子树结构哈希：结构相同的子树哈希相同
+        self.bfs_order = None  # 广度优先遍历顺序（由CodeTree按需计算）
+        self.signatures = None  # 按bfs_order排列的相似性签名id（-1表示无签名）
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def root(self):
+        """根节点视图"""
+        return NodeView(self, 0) if len(self.labels) else None
+
+    def node(self, idx):
+        """返回指定下标的节点视图"""
+        return NodeView(self, idx)
+
+    def name(self, idx):
+        return LABELS.lookup(self.labels[idx])
+
+    def expr(self, idx):
+        """节点的表达式字符串，没有时返回None"""
+        expr_id = self.exprs[idx]
+        return EXPRS.lookup(expr_id) if expr_id >= 0 else None
+
+    def children(self, idx):
+        """子节点下标列表"""
+        result = []
+        child = self.first_child[idx]
+        while child != -1:
+            result.append(child)
+            child = self.next_sibling[child]
+        return result
+
+    def child_count(self, idx):
+        count = 0
+        child = self.first_child[idx]
+        while child != -1:
+            count += 1
+            child = self.next_sibling[child]
+        return count
+
+    def depth(self, idx):
+        """节点深度（根为0）"""
+        return self.depths[idx]
+
+    def iter_bfs(self, start=0):
+        """广度优先遍历，产生节点下标"""
+        queue = [start]
+        head = 0
+        while head < len(queue):
+            idx = queue[head]
+            head += 1
+            yield idx
+            child = self.first_child[idx]
+            while child != -1:
+                queue.append(child)
+                child = self.next_sibling[child]
+
+    def render(self, start=0):
+        """与anytree.RenderTree相同的(pre, fill, 下标)序列"""
+        yield '', '', start
+        stack = [(self.children(start), 0, '')]
+        while stack:
+            kids, pos, indent = stack[-1]
+            if pos == len(kids):
+                stack.pop()
+                continue
+            stack[-1] = (kids, pos + 1, indent)
+            child = kids[pos]
+            last = pos == len(kids) - 1
+            yield indent + ('└── ' if last else '├── '), indent + ('    ' if last else '│   '), child
+            grandchildren = self.children(child)
+            if grandchildren:
+                stack.append((grandchildren, 0, indent + ('    ' if last else '│   ')))
+
+    def dumps(self):
+        """序列化为字节串：标签/表达式以字符串保存，与进程内的id无关"""
+        label_ids = {}
+        exprs_ids = {}
+        labels = array('i', (label_ids.setdefault(label, len(label_ids)) for label in self.labels))
+        exprs = array('i', (exprs_ids.setdefault(expr, len(exprs_ids)) if expr >= 0 else -1 for expr in self.exprs))
+        header = json.dumps({
+            'labels': [LABELS.lookup(label) for label in label_ids],
+            'exprs': [EXPRS.lookup(expr) for expr in exprs_ids],
+            'count': len(self.labels),
+        }, ensure_ascii=False).encode('utf-8')
+        parts = [struct.pack('<I', len(header)), header, labels.tobytes(), exprs.tobytes()]
+        parts.extend(getattr(self, field).tobytes() for field, _ in self.ARRAY_FIELDS)
+        return b''.join(parts)
+
+    @classmethod
+    def loads(cls, data):
+        """从dumps()的结果还原紧凑树，字符串重新驻留到本进程的标签表"""
+        view = memoryview(data)
+        (header_len,) = struct.unpack_from('<I', view)
+        offset = 4 + header_len
+        header = json.loads(bytes(view[4:offset]).decode('utf-8'))
+        count = header['count']
+
+        def take(typecode):
+            nonlocal offset
+            buf = array(typecode)
+            end = offset + buf.itemsize * count
+            buf.frombytes(view[offset:end])
+            offset = end
+            return buf
+
+        label_map = [LABELS.intern(text) for text in header['labels']]
+        expr_map = [EXPRS.intern(text) for text in header['exprs']]
+        labels = array('i', (label_map[label] for label in take('i')))
+        exprs = array('i', (expr_map[expr] if expr >= 0 else -1 for expr in take('i')))
+        fields = {field: take(typecode) for field, typecode in cls.ARRAY_FIELDS}
+        return cls(labels, fields['parents'], fields['first_child'], fields['next_sibling'], fields['sizes'],
+                   exprs, fields['depths'], fields['heights'], fields['hashes'])
+
+    def nbytes(self):
+        """数组缓冲区占用的字节数"""
+        return sum(buf.itemsize * len(buf) for buf in (
+            self.labels, self.parents, self.first_child, self.next_sibling, self.sizes, self.exprs,
+            self.depths, self.heights, self.hashes))
+
+
+class NodeView:
+    """CompactTree中单个节点的轻量视图，接口与anytree.Node的常用部分一致"""
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def name(self):
+        return self.tree.name(self.index)
+
+    @property
+    def expr_str(self):
+        expr = self.tree.expr(self.index)
+        if expr is None:
+            # 保持hasattr(node, 'expr_str')的判断语义
+            raise AttributeError('expr_str')
+        return expr
+
+    @property
+    def children(self):
+        return tuple(NodeView(self.tree, child) for child in self.tree.children(self.index))
+
+    @property
+    def parent(self):
+        parent = self.tree.parents[self.index]
+        return NodeView(self.tree, parent) if parent != -1 else None
+
+    @property
+    def depth(self):
+        return self.tree.depths[self.index]
+
+    @property
+    def size(self):
+        """子树节点数"""
+        return self.tree.sizes[self.index]
+
+    @property
+    def height(self):
+        """子树高度"""
+        return self.tree.heights[self.index]
+
+    @property
+    def structure_hash(self):
+        """子树结构哈希"""
+        return self.tree.hashes[self.index]
+
+    @property
+    def is_leaf(self):
+        return self.tree.first_child[self.index] == -1
+
+    @property
+    def is_root(self):
+        return self.tree.parents[self.index] == -1
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and self.tree is other.tree and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __repr__(self):
+        return f"NodeView({self.name!r}, index={self.index})"
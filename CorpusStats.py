@@ -0,0 +1,131 @@
+import os
+import json
+import math
+import struct
+from array import array
+from CodeTree import CodeTree
+from ParseCache import ParseCache
+
+
+def _hash_counts(compact, excluded):
+    """子树哈希 -> 出现次数"""
+    counts = {}
+    hashes = compact.hashes
+    for idx in range(len(compact)):
+        if idx not in excluded:
+            counts[hashes[idx]] = counts.get(hashes[idx], 0) + 1
+    return counts
+
+
+# ====================
+# CorpusStats类：全体提交中各子树片段的文档频率（count-min sketch），用于IDF加权
+# ====================
+class CorpusStats:
+    """子树结构哈希的文档频率统计
+
+    count-min sketch用depth行×width列的计数器代替哈希表，内存固定；
+    查询结果只会高估，不会低估，高估量随width增大而减小
+    """
+
+    def __init__(self, width=1 << 18, depth=4):
+        self.width = width
+        self.depth = depth
+        self.counts = array('I', [0]) * (width * depth)
+        self.documents = 0  # 已统计的提交数
+        self.seen = set()  # 已统计的提交（以源代码SHA-256的前8字节标识），避免同一份提交重复计数
+
+    def _cells(self, h):
+        """哈希在各行中对应的计数器位置（双重哈希：第i行取h1 + i*h2）"""
+        h1 = h & 0xffffffff
+        h2 = (h >> 32) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    @staticmethod
+    def document_key(source):
+        """提交的标识：源代码SHA-256的前8字节（结构相同的不同提交各自计数）"""
+        return int(ParseCache.make_key(source, CodeTree.PARSER_VERSION)[:16], 16)
+
+    def add(self, compact, source):
+        """统计一份提交：其中每种子树哈希的文档频率加1；已统计过的提交返回False
+
+        参数:
+            compact (CompactTree): 提交的紧凑树
+            source (str): 提交的源代码，用于识别已统计过的提交
+        """
+        key = self.document_key(source)
+        if not len(compact) or key in self.seen:
+            return False
+        self.seen.add(key)
+        self.documents += 1
+        counts = self.counts
+        for h in set(compact.hashes):
+            for cell in self._cells(h):
+                counts[cell] += 1
+        return True
+
+    def df(self, h):
+        """子树哈希的文档频率估计值"""
+        counts = self.counts
+        return min(counts[cell] for cell in self._cells(h))
+
+    def idf(self, h):
+        """平滑的逆文档频率：log((N+1)/(df+1)) + 1，越常见权重越低"""
+        return math.log((self.documents + 1) / (self.df(h) + 1)) + 1.0
+
+    def weighted_similarity(self, tree1, tree2, excluded1=(), excluded2=()):
+        """IDF加权的重复率：2*Σ min(c1, c2)*idf / (Σ c1*idf + Σ c2*idf)，c为各子树哈希出现次数
+
+        参数:
+            tree1, tree2 (CompactTree): 紧凑树
+            excluded1, excluded2: 不参与计算的节点下标（如模板代码）
+        """
+        counts1 = _hash_counts(tree1, excluded1)
+        counts2 = _hash_counts(tree2, excluded2)
+
+        weights = {h: self.idf(h) for h in counts1.keys() | counts2.keys()}
+        total = sum(c * weights[h] for h, c in counts1.items()) + sum(c * weights[h] for h, c in counts2.items())
+        if total == 0:
+            return 0.0
+        shared = sum(min(c, counts2[h]) * weights[h] for h, c in counts1.items() if h in counts2)
+        return min(2 * shared / total, 1.0)
+
+    def save(self, path):
+        """写入文件（先写临时文件再原子替换）"""
+        header = json.dumps({'width': self.width, 'depth': self.depth, 'documents': self.documents,
+                             'seen': len(self.seen), 'parser_version': CodeTree.PARSER_VERSION}).encode('utf-8')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(struct.pack('<I', len(header)))
+            file.write(header)
+            file.write(self.counts.tobytes())
+            file.write(array('Q', sorted(self.seen)).tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """从文件读取（子树哈希依赖解析器版本，版本不一致时抛出ValueError）"""
+        with open(path, 'rb') as file:
+            data = file.read()
+        (header_len,) = struct.unpack_from('<I', data)
+        header = json.loads(data[4:4 + header_len].decode('utf-8'))
+        version = header.get('parser_version')
+        if version != CodeTree.PARSER_VERSION:
+            raise ValueError(f"语料统计由解析器版本{version}建立，当前版本为{CodeTree.PARSER_VERSION}，请重新统计")
+        stats = cls(header['width'], header['depth'])
+        stats.documents = header['documents']
+        offset = 4 + header_len
+        size = stats.width * stats.depth * stats.counts.itemsize
+        stats.counts = array('I')
+        stats.counts.frombytes(data[offset:offset + size])
+        seen = array('Q')
+        seen.frombytes(data[offset + size:offset + size + header['seen'] * seen.itemsize])
+        stats.seen = set(seen)
+        return stats
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        """文件存在时读取，否则新建"""
+        if os.path.exists(path):
+            return cls.load(path)
+        return cls(**kwargs)
@@ -0,0 +1,147 @@
+import json
+import sqlite3
+import hashlib
+from CodeTree import CodeTree
+from CompactTree import CompactTree
+from fingerprint import subtree_hashes, node_histogram, kgram_hashes
+
+# 指纹种类
+SUBTREE = 0  # 子树结构哈希
+KGRAM = 1  # token k-gram哈希
+
+
+def to_signed(value):
+    """SQLite整数为有符号64位，无符号哈希需要转换"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+# ====================
+# FingerprintDB类：历年提交的指纹库（SQLite），新提交通过倒排索引查找候选
+# ====================
+class FingerprintDB:
+    """持久化的指纹库：每份提交只解析一次，查重时先查倒排索引再对少量候选精确比较"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            source_hash TEXT NOT NULL,
+            token_count INTEGER NOT NULL,
+            node_count INTEGER NOT NULL,
+            histogram TEXT NOT NULL,
+            tree BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            kind INTEGER NOT NULL,
+            hash INTEGER NOT NULL,
+            submission_id INTEGER NOT NULL REFERENCES submissions(id) ON DELETE CASCADE,
+            PRIMARY KEY (kind, hash, submission_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS fingerprints_by_submission ON fingerprints(submission_id);
+    """
+
+    def __init__(self, path, k=5, min_nodes=3):
+        """
+        参数:
+            path (str): 数据库文件路径（':memory:'表示内存数据库）
+            k (int): token k-gram的长度
+            min_nodes (int): 参与索引的子树最少节点数
+        """
+        self.k = k
+        self.min_nodes = min_nodes
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(self.SCHEMA)
+        self._check_version()
+
+    def _check_version(self):
+        """库中的树和子树哈希依赖解析器版本：空库记录当前版本，非空库版本不一致时拒绝打开"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == CodeTree.PARSER_VERSION:
+            return
+        if len(self):
+            self.conn.close()
+            raise ValueError(f"指纹库由解析器版本{version}建立，当前版本为{CodeTree.PARSER_VERSION}，请重新建库")
+        self.conn.execute(f"PRAGMA user_version = {int(CodeTree.PARSER_VERSION)}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+
+    def fingerprints(self, tree):
+        """提取一棵树的指纹集合：{(种类, 哈希)}"""
+        result = {(SUBTREE, to_signed(h)) for h in subtree_hashes(tree, self.min_nodes)}
+        result.update((KGRAM, to_signed(h)) for h in kgram_hashes(tree.normalized_tokens(), self.k))
+        return result
+
+    def add(self, name, code):
+        """解析并收录一份提交，同名提交会被替换"""
+        tree = CodeTree()
+        tree.build_tree(code)
+        return self.add_tree(name, tree)
+
+    def add_tree(self, name, tree):
+        """收录已建好的代码树"""
+        source_hash = hashlib.sha256(tree.source_code.encode('utf-8')).hexdigest()
+        with self.conn:
+            self.conn.execute("DELETE FROM submissions WHERE name = ?", (name,))
+            cursor = self.conn.execute(
+                "INSERT INTO submissions (name, source_hash, token_count, node_count, histogram, tree) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (name, source_hash, len(tree.normalized_tokens()), tree.total_nodes,
+                 json.dumps(node_histogram(tree)), tree.compact.dumps()))
+            submission_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO fingerprints (kind, hash, submission_id) VALUES (?, ?, ?)",
+                ((kind, h, submission_id) for kind, h in self.fingerprints(tree)))
+        return submission_id
+
+    def candidates(self, tree, limit=10):
+        """通过倒排索引找出共享指纹最多的提交，返回[(提交id, 名称, 共享比例)]"""
+        prints = self.fingerprints(tree)
+        if not prints:
+            return []
+        with self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_prints (kind INTEGER, hash INTEGER)")
+            self.conn.execute("DELETE FROM query_prints")
+            self.conn.executemany("INSERT INTO query_prints VALUES (?, ?)", prints)
+            rows = self.conn.execute(
+                "SELECT s.id, s.name, COUNT(*) AS shared FROM query_prints q "
+                "JOIN fingerprints f ON f.kind = q.kind AND f.hash = q.hash "
+                "JOIN submissions s ON s.id = f.submission_id "
+                "GROUP BY s.id ORDER BY shared DESC, s.id LIMIT ?", (limit,)).fetchall()
+        return [(submission_id, name, shared / len(prints)) for submission_id, name, shared in rows]
+
+    def load_tree(self, submission_id):
+        """从库中还原代码树（无需重新解析源代码）"""
+        row = self.conn.execute("SELECT tree, node_count FROM submissions WHERE id = ?",
+                                (submission_id,)).fetchone()
+        tree = CodeTree()
+        tree.load_compact(CompactTree.loads(row[0]), total_nodes=row[1])
+        return tree
+
+    def query(self, code, limit=10, mode='bucket'):
+        """检查新提交：索引取候选，再对候选精确计算重复率
+
+        返回:
+            list: [(名称, 指纹共享比例, 重复率)]，按重复率降序
+        """
+        tree = code if isinstance(code, CodeTree) else None
+        if tree is None:
+            tree = CodeTree()
+            tree.build_tree(code)
+
+        results = []
+        for submission_id, name, containment in self.candidates(tree, limit):
+            score = tree.calculate_similarity(self.load_tree(submission_id), mode=mode)
+            results.append((name, containment, score))
+        results.sort(key=lambda x: x[2], reverse=True)
+        return results
@@ -0,0 +1,167 @@
+import sqlite3
+import numpy as np
+from CodeTree import CodeTree
+from fingerprint import subtree_hashes
+from winnow import winnow_tokens
+
+MERSENNE = (1 << 31) - 1  # 置换哈希的模数，a*x+b不会溢出uint64
+
+
+def tree_features(tree, source='subtree'):
+    """代码树用于MinHash的特征集合：'subtree'为子树结构哈希，'winnow'为Winnowing指纹"""
+    if source == 'subtree':
+        return subtree_hashes(tree)
+    if source == 'winnow':
+        return {h for h, _ in winnow_tokens(tree.normalized_tokens())}
+    raise ValueError(f"未知的特征来源: {source}")
+
+
+def permutations(num_perm, seed=1):
+    """生成num_perm个随机置换哈希 (a*x+b) mod p 的参数"""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, MERSENNE, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, MERSENNE, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash(features, a, b):
+    """集合的MinHash签名：每个置换下特征哈希的最小值（空集合返回全为p的签名）"""
+    if not features:
+        return np.full(len(a), MERSENNE, dtype=np.uint32)
+    values = np.fromiter(features, dtype=np.uint64, count=len(features))
+    values = (values ^ (values >> np.uint64(32))) % np.uint64(MERSENNE)
+    # 矩阵运算：num_perm × 特征数
+    return ((np.outer(a, values) + b[:, None]) % np.uint64(MERSENNE)).min(axis=1).astype(np.uint32)
+
+
+# ====================
+# LSHIndex类：MinHash签名分段哈希，只有至少一段完全相同的提交才成为候选对
+# ====================
+class LSHIndex:
+    """持久化的MinHash-LSH索引，支持增量插入
+
+    Jaccard相似度为s的两份提交成为候选的概率为 1-(1-s^rows)^bands：
+    bands越多召回越高，rows越多候选越少
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS signatures (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            signature BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS buckets (
+            band INTEGER NOT NULL,
+            key BLOB NOT NULL,
+            submission_id INTEGER NOT NULL REFERENCES signatures(id) ON DELETE CASCADE,
+            PRIMARY KEY (band, key, submission_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS buckets_by_submission ON buckets(submission_id);
+    """
+
+    def __init__(self, path=':memory:', bands=32, rows=4, source='subtree', seed=1):
+        """
+        参数:
+            path (str): 索引文件路径（默认内存）
+            bands (int): 签名分成的段数
+            rows (int): 每段的行数，签名长度为bands*rows
+            source (str): 特征来源，见tree_features
+            seed (int): 置换哈希的随机种子
+        """
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(self.SCHEMA)
+
+        # 已有索引沿用建库时的参数，否则签名不可比
+        settings = dict(self.conn.execute("SELECT key, value FROM settings"))
+        if settings:
+            bands, rows, seed = int(settings['bands']), int(settings['rows']), int(settings['seed'])
+            source = settings['source']
+        else:
+            with self.conn:
+                self.conn.executemany("INSERT INTO settings VALUES (?, ?)",
+                                      [('bands', str(bands)), ('rows', str(rows)),
+                                       ('seed', str(seed)), ('source', source)])
+        self._check_version(settings.get('parser_version'))
+        self.bands = bands
+        self.rows = rows
+        self.seed = seed
+        self.source = source
+        self.a, self.b = permutations(bands * rows, seed)
+
+    def _check_version(self, version):
+        """签名依赖解析器版本：空索引记录当前版本，非空索引版本不一致时拒绝打开"""
+        current = str(CodeTree.PARSER_VERSION)
+        if version == current:
+            return
+        if len(self):
+            self.conn.close()
+            raise ValueError(f"LSH索引由解析器版本{version}建立，当前版本为{current}，请重新建库")
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings VALUES ('parser_version', ?)", (current,))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def signature(self, tree):
+        """代码树的MinHash签名"""
+        return minhash(tree_features(tree, self.source), self.a, self.b)
+
+    def _band_keys(self, signature):
+        """签名切分为bands段，每段的字节串作为桶键"""
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def add(self, name, tree):
+        """插入（或替换同名的）提交"""
+        signature = self.signature(tree)
+        with self.conn:
+            self.conn.execute("DELETE FROM signatures WHERE name = ?", (name,))
+            submission_id = self.conn.execute("INSERT INTO signatures (name, signature) VALUES (?, ?)",
+                                              (name, signature.tobytes())).lastrowid
+            self.conn.executemany("INSERT INTO buckets (band, key, submission_id) VALUES (?, ?, ?)",
+                                  [(band, key, submission_id) for band, key in self._band_keys(signature)])
+        return submission_id
+
+    def query(self, tree):
+        """与tree至少有一段签名相同的已收录提交名称，按相同段数降序"""
+        keys = self._band_keys(self.signature(tree))
+        with self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_keys (band INTEGER, key BLOB)")
+            self.conn.execute("DELETE FROM query_keys")
+            self.conn.executemany("INSERT INTO query_keys VALUES (?, ?)", keys)
+            rows = self.conn.execute(
+                "SELECT s.name, COUNT(*) AS shared FROM query_keys q "
+                "JOIN buckets b ON b.band = q.band AND b.key = q.key "
+                "JOIN signatures s ON s.id = b.submission_id "
+                "GROUP BY s.id ORDER BY shared DESC, s.id").fetchall()
+        return [name for name, _ in rows]
+
+    def candidate_pairs(self):
+        """索引内所有发生碰撞的提交对{(名称1, 名称2)}，名称1按收录顺序在前"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT s1.name, s2.name FROM buckets b1 "
+            "JOIN buckets b2 ON b1.band = b2.band AND b1.key = b2.key AND b1.submission_id < b2.submission_id "
+            "JOIN signatures s1 ON s1.id = b1.submission_id "
+            "JOIN signatures s2 ON s2.id = b2.submission_id")
+        return set(rows)
+
+    def estimate_jaccard(self, name1, name2):
+        """用签名中相同位置的比例估计两份提交特征集合的Jaccard系数"""
+        sig1, sig2 = (np.frombuffer(self.conn.execute("SELECT signature FROM signatures WHERE name = ?",
+                                                      (name,)).fetchone()[0], dtype=np.uint32)
+                      for name in (name1, name2))
+        return float((sig1 == sig2).mean())
@@ -0,0 +1,123 @@
+import os
+import json
+import struct
+import hashlib
+from collections import OrderedDict  # 按访问顺序维护LRU
+from CompactTree import CompactTree
+
+
+# ====================
+# ParseCache类：按源代码内容缓存建好的代码树
+# ====================
+class ParseCache:
+    """以源代码SHA-256为键的建树缓存：内存LRU + 可选的磁盘层"""
+
+    def __init__(self, max_entries=256, max_bytes=None, disk_dir=None):
+        """
+        参数:
+            max_entries (int): 内存中最多保留的树数量
+            max_bytes (int): 内存中树占用字节数上限（None表示不限制）
+            disk_dir (str): 磁盘缓存目录（None表示不使用磁盘层）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # 键 -> (预处理代码, 节点计数, 紧凑树, 占用字节)
+        self._bytes = 0
+        # 命中统计
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(code, version):
+        """缓存键：解析器版本 + 源代码内容的SHA-256"""
+        digest = hashlib.sha256()
+        digest.update(f"{version}\0".encode('utf-8'))
+        digest.update(code.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """查找缓存，返回(预处理代码, 节点计数, 紧凑树)，未命中返回None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[:3]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    with open(path, 'rb') as file:
+                        entry = self._decode(file.read())
+                except (OSError, ValueError, KeyError, struct.error):
+                    entry = None  # 损坏的缓存文件按未命中处理
+                if entry is not None:
+                    self.disk_hits += 1
+                    self._remember(key, entry)
+                    return entry
+
+        self.misses += 1
+        return None
+
+    def put(self, key, preprocessed_code, total_nodes, compact):
+        """写入缓存（内存层，如有磁盘层同时落盘）"""
+        entry = (preprocessed_code, total_nodes, compact)
+        self._remember(key, entry)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(self._encode(entry))
+            os.replace(tmp_path, path)  # 原子替换，避免并发读到半个文件
+
+    def clear(self):
+        """清空内存层（磁盘层保留）"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        """命中统计"""
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remember(self, key, entry):
+        """放入内存LRU并按数量/字节上限淘汰最久未使用的树"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[3]
+        size = entry[2].nbytes() + len(entry[0])
+        self._entries[key] = entry + (size,)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted[3]
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.tree")
+
+    @staticmethod
+    def _encode(entry):
+        preprocessed_code, total_nodes, compact = entry
+        header = json.dumps({'preprocessed_code': preprocessed_code, 'total_nodes': total_nodes},
+                            ensure_ascii=False).encode('utf-8')
+        return struct.pack('<I', len(header)) + header + compact.dumps()
+
+    @staticmethod
+    def _decode(data):
+        (header_len,) = struct.unpack_from('<I', data)
+        header = json.loads(data[4:4 + header_len].decode('utf-8'))
+        compact = CompactTree.loads(data[4 + header_len:])
+        return header['preprocessed_code'], header['total_nodes'], compact
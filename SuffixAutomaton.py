@@ -0,0 +1,164 @@
+from array import array
+from collections import namedtuple
+from winnow import Match
+
+# 多份提交中重复出现的片段：长度、出现在几份提交中、首次出现的提交及其token区间和行范围
+Fragment = namedtuple('Fragment', ['length', 'count', 'name', 'tokens', 'lines'])
+
+
+# ====================
+# SuffixAutomaton类：所有提交token流上的广义后缀自动机
+# ====================
+class SuffixAutomaton:
+    """广义后缀自动机：每个状态代表一组出现位置（endpos）相同的片段
+
+    状态数不超过总token数的两倍，逐token插入，总构建时间与总token数成线性
+    """
+
+    def __init__(self):
+        self.length = array('i', [0])  # 状态中最长片段的长度
+        self.link = array('i', [-1])  # 后缀链接
+        self.next = [{}]  # 转移：token id -> 状态
+        self.first_doc = array('i', [-1])  # 首次出现所在的提交
+        self.first_end = array('i', [-1])  # 首次出现的结束位置（含）
+        self.token_ids = {}  # token文本 -> id
+        self.names = []  # 提交名称
+        self.docs = []  # 每份提交的token id序列
+        self.lines = []  # 每份提交各token的行号
+        self.prefix_states = []  # 每份提交各前缀对应的状态
+        self._counts = None  # 每个状态出现在几份提交中（按需计算）
+
+    def __len__(self):
+        return len(self.length)
+
+    def _new_state(self, length, link, transitions, doc, end):
+        self.length.append(length)
+        self.link.append(link)
+        self.next.append(transitions)
+        self.first_doc.append(doc)
+        self.first_end.append(end)
+        return len(self.length) - 1
+
+    def _clone(self, p, q, c):
+        """把状态q拆出长度为length[p]+1的部分，并把p及其后缀上指向q的转移改指向新状态"""
+        clone = self._new_state(self.length[p] + 1, self.link[q], dict(self.next[q]),
+                                self.first_doc[q], self.first_end[q])
+        while p != -1 and self.next[p].get(c) == q:
+            self.next[p][c] = clone
+            p = self.link[p]
+        self.link[q] = clone
+        return clone
+
+    def _extend(self, last, c, doc, end):
+        """在状态last后追加token c，返回新前缀对应的状态"""
+        if c in self.next[last]:
+            # 该前缀此前已在其他提交中出现过
+            q = self.next[last][c]
+            if self.length[last] + 1 == self.length[q]:
+                return q
+            return self._clone(last, q, c)
+
+        cur = self._new_state(self.length[last] + 1, 0, {}, doc, end)
+        p = last
+        while p != -1 and c not in self.next[p]:
+            self.next[p][c] = cur
+            p = self.link[p]
+        if p != -1:
+            q = self.next[p][c]
+            if self.length[p] + 1 == self.length[q]:
+                self.link[cur] = q
+            else:
+                self.link[cur] = self._clone(p, q, c)
+        return cur
+
+    def add(self, name, tokens):
+        """加入一份提交的token流（CodeTree.normalized_tokens()的结果），返回提交编号"""
+        ids = array('i', (self.token_ids.setdefault(text, len(self.token_ids)) for text, _ in tokens))
+        return self._add_ids(name, ids, array('i', (line for _, line in tokens)))
+
+    def _add_ids(self, name, ids, lines):
+        doc = len(self.names)
+        self.names.append(name)
+        self.docs.append(ids)
+        self.lines.append(lines)
+        states = array('i')
+        last = 0
+        for end, c in enumerate(ids):
+            last = self._extend(last, c, doc, end)
+            states.append(last)
+        self.prefix_states.append(states)
+        self._counts = None
+        return doc
+
+    def doc_counts(self):
+        """每个状态的片段出现在几份提交中
+
+        从每份提交的各前缀状态沿后缀链接向上标记，遇到本提交已标记的状态即停止
+        """
+        if self._counts is None:
+            counts = array('i', [0]) * len(self)
+            marked = array('i', [-1]) * len(self)
+            link = self.link
+            for doc, states in enumerate(self.prefix_states):
+                for s in states:
+                    while s > 0 and marked[s] != doc:
+                        marked[s] = doc
+                        counts[s] += 1
+                        s = link[s]
+            self._counts = counts
+        return self._counts
+
+    def _fragment(self, state, count):
+        doc = self.first_doc[state]
+        end = self.first_end[state]
+        start = end - self.length[state] + 1
+        lines = self.lines[doc]
+        return Fragment(self.length[state], count, self.names[doc], (start, end + 1), (lines[start], lines[end]))
+
+    def common_fragments(self, k=2, min_length=20):
+        """出现在至少k份提交中、不短于min_length个token的极大片段，按长度降序
+
+        向右再延伸一个token后仍出现在至少k份提交中的片段不是极大的，不再报告
+        """
+        counts = self.doc_counts()
+        result = []
+        for state in range(1, len(self)):
+            if counts[state] < k or self.length[state] < min_length:
+                continue
+            if any(counts[t] >= k for t in self.next[state].values()):
+                continue
+            result.append(self._fragment(state, counts[state]))
+        result.sort(key=lambda f: (-f.length, -f.count))
+        return result
+
+    def longest_common(self, doc1, doc2):
+        """两份提交之间最长的公共片段，返回Match（没有公共token时返回None）
+
+        只为doc1建一个后缀自动机，再让doc2在其上行走，时间与两份提交的长度之和成线性
+        """
+        single = SuffixAutomaton()
+        single._add_ids(self.names[doc1], self.docs[doc1], self.lines[doc1])
+
+        state = 0
+        matched = 0
+        best = (0, 0, 0)  # (长度, doc2中的结束位置, doc1自动机中的状态)
+        for end, c in enumerate(self.docs[doc2]):
+            while state and c not in single.next[state]:
+                state = single.link[state]
+                matched = single.length[state]
+            if c in single.next[state]:
+                state = single.next[state][c]
+                matched += 1
+            else:
+                matched = 0
+            if matched > best[0]:
+                best = (matched, end, state)
+
+        length, end2, state = best
+        if length == 0:
+            return None
+        end1 = single.first_end[state]
+        start1, start2 = end1 - length + 1, end2 - length + 1
+        lines1, lines2 = self.lines[doc1], self.lines[doc2]
+        return Match((start1, end1 + 1), (start2, end2 + 1),
+                     (lines1[start1], lines1[end1]), (lines2[start2], lines2[end2]))
@@ -0,0 +1,70 @@
+import weakref
+from CodeTree import CodeTree
+from winnow import rolling_hashes
+
+
+# ====================
+# Template类：教师下发的模板/骨架代码，其中出现的子树和token片段不计入重复率
+# ====================
+class Template:
+    """模板代码的子树哈希与k-gram哈希，预先算好并冻结，比较时每次查找O(1)"""
+
+    def __init__(self, sources=(), min_nodes=2, k=5):
+        """
+        参数:
+            sources (iterable): 模板源代码
+            min_nodes (int): 排除的子树最少节点数（单个叶子如0、var太常见，不排除）
+            k (int): k-gram长度，需与winnow比较时的k一致
+        """
+        self.min_nodes = min_nodes
+        self.k = k
+        subtree_hashes = set()
+        kgrams = set()
+        root_labels = set()
+        for code in sources:
+            tree = CodeTree()
+            tree.build_tree(code)
+            compact = tree.compact
+            if compact is None or not len(compact):
+                continue
+            root_labels.add(compact.labels[0])
+            subtree_hashes.update(compact.hashes[i] for i in range(len(compact)) if compact.sizes[i] >= min_nodes)
+            kgrams.update(rolling_hashes([text for text, _ in tree.normalized_tokens()], k))
+        self.subtree_hashes = frozenset(subtree_hashes)
+        self.kgrams = frozenset(kgrams)
+        self.root_labels = frozenset(root_labels)  # 骨架的根（如main）
+        self._excluded = weakref.WeakKeyDictionary()  # 紧凑树 -> 被排除的节点下标
+
+    @classmethod
+    def from_files(cls, paths, **kwargs):
+        """从模板文件创建"""
+        sources = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8', errors='replace') as file:
+                sources.append(file.read())
+        return cls(sources, **kwargs)
+
+    def excluded(self, compact):
+        """紧凑树中属于模板的节点下标：与模板子树结构相同的整棵子树，以及与模板同名的根节点"""
+        result = self._excluded.get(compact)
+        if result is None:
+            hashes = compact.hashes
+            sizes = compact.sizes
+            nodes = set()
+            if len(compact) and compact.labels[0] in self.root_labels:
+                nodes.add(0)
+            idx = 0
+            n = len(compact)
+            while idx < n:
+                if sizes[idx] >= self.min_nodes and hashes[idx] in self.subtree_hashes:
+                    # 先序编号下子树是连续区间，整段排除后跳过
+                    nodes.update(range(idx, idx + sizes[idx]))
+                    idx += sizes[idx]
+                else:
+                    idx += 1
+            result = self._excluded[compact] = frozenset(nodes)
+        return result
+
+    def filter_prints(self, prints):
+        """从指纹集合中去掉模板中出现过的k-gram"""
+        return prints - self.kgrams
@@ -0,0 +1,226 @@
+import os
+import sys
+import csv
+import glob
+import json
+import argparse
+from CodeTree import CodeTree
+from winnow import winnow_tokens, resemblance
+from gst import tile
+
+# ====================
+# 命令行批处理：对一批C代码两两计算重复率（不依赖tkinter/PIL/graphviz）
+# ====================
+
+# 基于token流而非代码树的模式，需要原始源代码，只能单进程计算
+TOKEN_MODES = ('winnow', 'gst')
+# 支持教师模板的模式：代码树模式见CodeTree.TEMPLATE_MODES，'winnow'过滤模板中的指纹
+TEMPLATE_MODES = CodeTree.TEMPLATE_MODES + ('winnow',)
+
+
+def collect_files(patterns):
+    """把目录或通配符展开为排好序的.c文件列表"""
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for dirpath, _, filenames in os.walk(pattern):
+                for filename in filenames:
+                    if filename.endswith('.c'):
+                        files.add(os.path.join(dirpath, filename))
+        else:
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    files.add(path)
+    return sorted(files)
+
+
+def read_source(path):
+    """读取源文件，无法解码的字节用替换字符代替"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        return file.read()
+
+
+def build_trees(paths, log=sys.stderr):
+    """每个文件只建一次树，返回[(路径, CodeTree)]，建树失败的文件跳过并记录"""
+    trees = []
+    for path in paths:
+        tree = CodeTree()
+        try:
+            tree.build_tree(read_source(path))
+        except Exception as e:
+            print(f"跳过 {path}: {e}", file=log)
+            continue
+        trees.append((path, tree))
+    return trees
+
+
+def update_corpus_stats(trees, path=None):
+    """把本次的代码树计入语料统计；给出path时从文件读取并写回，实现跨批次的增量更新"""
+    from CorpusStats import CorpusStats
+    stats = CorpusStats.open(path) if path else CorpusStats()
+    added = sum(stats.add(tree.compact, tree.source_code) for _, tree in trees)
+    if path:
+        stats.save(path)
+        print(f"语料统计: 新增 {added} 份，共 {stats.documents} 份", file=sys.stderr)
+    return stats
+
+
+def all_pairs(n):
+    """上三角的全部下标对"""
+    for i in range(n):
+        for j in range(i + 1, n):
+            yield i, j
+
+
+def lsh_pairs(trees, bands, rows):
+    """只返回MinHash-LSH中发生碰撞的下标对（按下标排序）"""
+    # 按需导入：LSH依赖numpy
+    from LSHIndex import LSHIndex
+    with LSHIndex(bands=bands, rows=rows) as index:
+        for i, (_, tree) in enumerate(trees):
+            index.add(str(i), tree)
+        # 按收录顺序插入，名称1的下标总是较小
+        return sorted((int(a), int(b)) for a, b in index.candidate_pairs())
+
+
+def histogram_pairs(trees, threshold, mode, pairs=None):
+    """节点类型直方图给出的重复率上界不低于threshold的下标对（无numpy或上界不适用于mode时不筛选）"""
+    try:
+        from prefilter import histogram_matrix, candidate_pairs, BOUNDED_MODES, TEMPLATE_BOUNDED_MODES
+    except ImportError:
+        return pairs
+    if mode not in (BOUNDED_MODES if CodeTree.template is None else TEMPLATE_BOUNDED_MODES):
+        return pairs
+    return candidate_pairs(histogram_matrix([tree for _, tree in trees]), threshold, pairs)
+
+
+def iter_pairs(trees, threshold=0.0, mode='bucket', prefilter=None, pairs=None, min_match=9):
+    """遍历文件对（默认上三角的全部文件对），产生重复率不低于threshold的(路径1, 路径2, 重复率)
+
+    mode为'winnow'时直接以Winnowing指纹的Jaccard系数作为重复率，
+    为'gst'时以Greedy String Tiling的覆盖率作为重复率（瓦片不短于min_match个token）；
+    prefilter不为None时，指纹包含比例（取双方较大者）低于它的文件对不再建树比较
+    """
+    prints = None
+    if mode == 'winnow' or prefilter is not None:
+        # 每个文件的指纹只计算一次
+        prints = [{h for h, _ in winnow_tokens(tree.normalized_tokens())} for _, tree in trees]
+        if CodeTree.template is not None:
+            prints = [CodeTree.template.filter_prints(p) for p in prints]
+    tokens = None
+    if mode == 'gst':
+        tokens = [tree.normalized_tokens() for _, tree in trees]
+
+    for i, j in (pairs if pairs is not None else all_pairs(len(trees))):
+        path1, tree1 = trees[i]
+        path2, tree2 = trees[j]
+        if prints is not None:
+            jaccard, containment1, containment2 = resemblance(prints[i], prints[j])
+            if prefilter is not None and max(containment1, containment2) < prefilter:
+                continue
+        if mode == 'winnow':
+            score = jaccard
+        elif mode == 'gst':
+            score = tile(tokens[i], tokens[j], min_match).similarity
+        else:
+            score = tree1.calculate_similarity(tree2, mode=mode)
+        if score >= threshold:
+            yield path1, path2, score
+
+
+def iter_matrix_pairs(paths, matrix, threshold=0.0):
+    """从重复率矩阵的上三角产生(路径1, 路径2, 重复率)，顺序与iter_pairs相同"""
+    for i in range(len(paths)):
+        for j in range(i + 1, len(paths)):
+            score = float(matrix[i][j])
+            if score >= threshold:
+                yield paths[i], paths[j], score
+
+
+def write_results(results, output, fmt='csv'):
+    """以CSV或JSONL格式逐条写出结果"""
+    if fmt == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(['file1', 'file2', 'similarity'])
+        for path1, path2, score in results:
+            writer.writerow([path1, path2, f"{score:.6f}"])
+            output.flush()
+    else:
+        for path1, path2, score in results:
+            output.write(json.dumps({'file1': path1, 'file2': path2, 'similarity': round(score, 6)},
+                                    ensure_ascii=False) + "\n")
+            output.flush()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="C代码批量查重：计算所有文件两两之间的重复率")
+    parser.add_argument('inputs', nargs='+', help="C源文件目录或通配符（如 'submissions/**/*.c'）")
+    parser.add_argument('-f', '--format', choices=['csv', 'jsonl'], default='csv', help="输出格式")
+    parser.add_argument('-t', '--threshold', type=float, default=0.0, help="只输出重复率不低于该值的文件对")
+    parser.add_argument('-m', '--mode', default='bucket', choices=CodeTree.MODES + TOKEN_MODES,
+                        help="calculate_similarity的计算模式；'winnow'只用Winnowing指纹，"
+                             "'gst'用Greedy String Tiling（两者仅单进程）")
+    parser.add_argument('--min-match', type=int, default=9, help="'gst'模式下瓦片的最小token数")
+    parser.add_argument('-p', '--prefilter', type=float,
+                        help="Winnowing指纹包含比例低于该值的文件对不再建树比较（仅单进程）")
+    parser.add_argument('-l', '--lsh', type=int, nargs=2, metavar=('BANDS', 'ROWS'),
+                        help="只比较MinHash-LSH碰撞的文件对（仅单进程）")
+    parser.add_argument('-T', '--template', action='append', default=[],
+                        help="教师模板文件，其中的代码不计入重复率（可多次指定，仅单进程）")
+    parser.add_argument('--idf-stats', metavar='PATH',
+                        help="'idf'模式的语料统计文件：不存在时新建，本次的文件会增量计入并写回（仅单进程）")
+    parser.add_argument('-o', '--output', help="输出文件（默认标准输出）")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="并行进程数（大于1时使用多进程矩阵计算）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = collect_files(args.inputs)
+    if not paths:
+        print("未找到C源文件", file=sys.stderr)
+        return 1
+
+    if args.template:
+        if args.mode not in TEMPLATE_MODES:
+            print(f"-T 不支持 -m {args.mode}，可用模式: {', '.join(TEMPLATE_MODES)}", file=sys.stderr)
+            return 1
+        from Template import Template
+        CodeTree.template = Template.from_files(args.template)
+
+    # 这些选项只在单进程路径中实现
+    serial_only = [option for option, used in (
+        (f"-m {args.mode}", args.mode in TOKEN_MODES or args.mode == 'idf'),
+        ("-p", args.prefilter is not None),
+        ("-l", args.lsh is not None),
+        ("-T", bool(args.template)),
+        ("--idf-stats", bool(args.idf_stats)),
+    ) if used]
+    if args.jobs > 1 and serial_only:
+        print(f"警告: {', '.join(serial_only)} 仅支持单进程，忽略 -j {args.jobs}", file=sys.stderr)
+
+    if args.jobs > 1 and not serial_only:
+        # 按需导入：多进程模式依赖numpy
+        from parallel import similarity_matrix
+        valid_paths, matrix = similarity_matrix(paths, jobs=args.jobs, mode=args.mode)
+        print(f"已构建 {len(valid_paths)}/{len(paths)} 棵代码树", file=sys.stderr)
+        results = iter_matrix_pairs(valid_paths, matrix, args.threshold)
+    else:
+        trees = build_trees(paths)
+        print(f"已构建 {len(trees)}/{len(paths)} 棵代码树", file=sys.stderr)
+        if args.mode == 'idf' or args.idf_stats:
+            CodeTree.corpus_stats = update_corpus_stats(trees, args.idf_stats)
+        pairs = lsh_pairs(trees, *args.lsh) if args.lsh else None
+        if args.threshold > 0:
+            pairs = histogram_pairs(trees, args.threshold, args.mode, pairs)
+        results = iter_pairs(trees, args.threshold, args.mode, args.prefilter, pairs, args.min_match)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as output:
+            write_results(results, output, args.format)
+    else:
+        write_results(results, sys.stdout, args.format)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+from lexer import join_tokens
+
+# ====================
+# Pratt表达式解析：一次扫描token序列，按整数优先级决定结合方式，
+# 先得到(标签, 子节点元组)形式的语法树，再由调用方自顶向下一次性建节点；
+# 括号、运算符等嵌套结构用显式栈代替递归，深层嵌套不会超出Python的递归深度
+# ====================
+
+# 二元运算符优先级（数值越大结合越紧）
+BINARY_PRECEDENCE = {
+    ',': 1,
+    '=': 2, '+=': 2, '-=': 2, '*=': 2, '/=': 2, '%=': 2, '&=': 2, '|=': 2, '^=': 2, '<<=': 2, '>>=': 2,
+    '?': 3,
+    '||': 4, '&&': 5, '|': 6, '^': 7, '&': 8,
+    '==': 9, '!=': 9, '<': 10, '>': 10, '<=': 10, '>=': 10,
+    '<<': 11, '>>': 11, '+': 12, '-': 12, '*': 13, '/': 13, '%': 13,
+}
+# 右结合：赋值和三目运算符
+RIGHT_ASSOCIATIVE = frozenset(('=', '+=', '-=', '*=', '/=', '%=', '&=', '|=', '^=', '<<=', '>>=', '?'))
+# 前缀运算符的优先级：高于所有二元运算符，低于后缀运算、成员访问、调用和下标
+PREFIX_PRECEDENCE = 14
+PREFIX_OPERATORS = frozenset(('-', '+', '!', '~', '*', '&', '++', '--', 'sizeof'))
+# 成员访问：和下标一样属于后缀运算，右侧只取一个成员名
+MEMBER_OPERATORS = frozenset(('.', '->'))
+# 只在逗号之上解析（函数实参、初始化列表元素）
+ASSIGNMENT_PRECEDENCE = 2
+# 出现在'('后表示类型转换的关键字
+TYPE_KEYWORDS = frozenset((
+    'int', 'float', 'char', 'double', 'long', 'short', 'signed', 'unsigned',
+    'const', 'volatile', 'struct', 'enum', 'union', 'void'
+))
+# 二元运算符之外的表达式节点标签
+# 前后缀的++/--使用相同标签：i++与++i单独成句时含义相同，互换不应影响重复率
+NODE_LABELS = ('?:', 'call', '[]', 'cast', 'sizeof', '{}', '!', '~', '++', '--', '.', '->')
+
+# 表达式在这些token处结束（由外层处理）
+CLOSERS = frozenset((')', ']', '}', ':', ';'))
+OPENERS = frozenset(('(', '[', '{'))
+
+# _parse的状态：解析操作数 / 处理后缀和二元运算 / 当前层结束，交给外层结构
+_OPERAND, _INFIX, _RESUME = range(3)
+
+
+def parse_expression(tokens):
+    """解析token序列，返回顶层表达式节点列表（节点为(标签, 子节点元组)）
+
+    语法错误不抛异常：缺少的操作数省略，多余的闭括号跳过，其余部分继续作为新的表达式解析
+    """
+    nodes = []
+    pos = 0
+    n = len(tokens)
+    while pos < n:
+        node, end = _parse(tokens, pos, 0)
+        if node is not None:
+            nodes.append(node)
+        pos = end if end > pos else pos + 1
+    return nodes
+
+
+def _parse(tokens, pos, min_precedence):
+    """解析优先级不低于min_precedence的表达式，返回(节点, 结束下标)
+
+    遇到嵌套结构时把外层尚未完成的部分压栈，转而解析内层；内层结束后出栈，
+    按外层的种类组装节点，再以外层的min_precedence继续
+    """
+    n = len(tokens)
+    stack = []  # 外层结构：(种类, 数据, 外层的min_precedence)
+    left = None
+    state = _OPERAND
+    while True:
+        if state == _OPERAND:
+            # 操作数及其前缀：括号、类型转换、初始化列表、前缀运算符和叶子
+            token = tokens[pos] if pos < n else None
+            state = _INFIX
+            if token == '(':
+                close = _type_close(tokens, pos)
+                if close is not None:
+                    # 类型转换：(类型)操作数
+                    stack.append(('cast', join_tokens(tokens[pos + 1:close]), min_precedence))
+                    pos, min_precedence, state = close + 1, PREFIX_PRECEDENCE, _OPERAND
+                else:
+                    stack.append(('(', None, min_precedence))
+                    pos, min_precedence, state = pos + 1, 0, _OPERAND
+            elif token == '{':
+                stack.append(('list', ('{}', [], '}', None), min_precedence))
+                pos, state = pos + 1, _RESUME
+            elif token in PREFIX_OPERATORS:
+                close = _type_close(tokens, pos + 1) if token == 'sizeof' else None
+                if close is not None:
+                    left, pos = ('sizeof', ((join_tokens(tokens[pos + 2:close]), ()),)), close + 1
+                else:
+                    stack.append(('prefix', token, min_precedence))
+                    pos, min_precedence, state = pos + 1, PREFIX_PRECEDENCE, _OPERAND
+            elif token is None or token in CLOSERS or token in BINARY_PRECEDENCE:
+                # 缺少操作数
+                left = None
+            else:
+                left, pos = (token, ()), pos + 1
+            continue
+
+        if state == _INFIX:
+            state = _RESUME
+            while pos < n:
+                token = tokens[pos]
+                # 后缀运算、成员访问、调用、下标的优先级最高
+                if token == '++' or token == '--':
+                    if left is None:
+                        break
+                    left = (token, (left,))
+                    pos += 1
+                elif token in MEMBER_OPERATORS:
+                    pos += 1
+                    member = tokens[pos] if pos < n else None
+                    if member is None or member in CLOSERS or member in OPENERS or member in BINARY_PRECEDENCE:
+                        # 缺少成员名
+                        left = (token, _present(left))
+                    else:
+                        left = (token, _present(left, (member, ())))
+                        pos += 1
+                elif token == '(':
+                    if left is None:
+                        break
+                    stack.append(('list', ('call', [left], ')', None), min_precedence))
+                    pos += 1
+                    break
+                elif token == '[':
+                    stack.append(('[]', left, min_precedence))
+                    pos, min_precedence, state = pos + 1, 0, _OPERAND
+                    break
+                else:
+                    precedence = BINARY_PRECEDENCE.get(token)
+                    if precedence is None or precedence < min_precedence:
+                        break
+                    if token == '?':
+                        # 三目运算符：中间部分到配对的':'为止，可以包含任意表达式
+                        stack.append(('?', left, min_precedence))
+                        pos, min_precedence, state = pos + 1, 0, _OPERAND
+                        break
+                    stack.append(('binary', (token, left), min_precedence))
+                    next_precedence = precedence if token in RIGHT_ASSOCIATIVE else precedence + 1
+                    pos, min_precedence, state = pos + 1, next_precedence, _OPERAND
+                    break
+            continue
+
+        # 当前层结束：left为内层的结果
+        if not stack:
+            return left, pos
+        kind, data, min_precedence = stack.pop()
+        state = _INFIX
+        if kind == '(':
+            # 括号只影响结合顺序，不单独建节点
+            if pos < n and tokens[pos] == ')':
+                pos += 1
+        elif kind == 'cast':
+            left = ('cast', _present((data, ()), left))
+        elif kind == 'prefix':
+            left = (data, _present(left))
+        elif kind == 'binary':
+            left = (data[0], _present(data[1], left))
+        elif kind == '[]':
+            if pos < n and tokens[pos] == ']':
+                pos += 1
+            left = ('[]', _present(data, left))
+        elif kind == '?':
+            if pos < n and tokens[pos] == ':':
+                pos += 1
+            stack.append(('?:', (data, left), min_precedence))
+            min_precedence, state = BINARY_PRECEDENCE['?'], _OPERAND
+        elif kind == '?:':
+            left = ('?:', _present(data[0], data[1], left))
+        else:
+            # 以逗号分隔、以closer结束的列表（实参或初始化列表）；start为None表示刚遇到开括号
+            label, items, closer, start = data
+            if start is not None:
+                if left is not None:
+                    items.append(left)
+                if pos < n and tokens[pos] == ',':
+                    pos += 1
+                elif pos == start:
+                    # 无法解析的token（如不配对的闭括号），跳过
+                    pos += 1
+            if pos < n and tokens[pos] != closer:
+                stack.append(('list', (label, items, closer, pos), min_precedence))
+                min_precedence, state = ASSIGNMENT_PRECEDENCE, _OPERAND
+            else:
+                if pos < n:
+                    pos += 1
+                left = (label, tuple(items))
+
+
+def _type_close(tokens, pos):
+    """tokens[pos]为'('且括号内是类型名时，返回配对的')'下标，否则返回None"""
+    if pos + 1 >= len(tokens) or tokens[pos] != '(' or tokens[pos + 1] not in TYPE_KEYWORDS:
+        return None
+    for i in range(pos + 2, len(tokens)):
+        token = tokens[i]
+        if token == ')':
+            return i
+        if token not in TYPE_KEYWORDS and token not in ('*', 'var'):
+            return None
+    return None
+
+
+def _present(*nodes):
+    """去掉缺失的操作数"""
+    return tuple(node for node in nodes if node is not None)
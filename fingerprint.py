@@ -0,0 +1,55 @@
+from hashlib import blake2b
+from CodeTree import CodeTree
+from CompactTree import LABELS
+from expression import NODE_LABELS
+
+# ====================
+# 代码指纹：子树哈希、节点类型直方图、token k-gram哈希
+# ====================
+
+# 节点类型词表：控制结构、语句种类和运算符，其余标签归入arg/operand
+NODE_TYPES = (
+    'main', 'block', 'if', 'else if', 'else', 'for', 'while', 'switch', 'case', 'default', 'value',
+    'condition', 'variable', 'expression', 'sentence', 'return', 'printf', 'scanf', 'break', 'continue',
+) + tuple(CodeTree.OPERATOR_PRECEDENCE) + NODE_LABELS + ('arg', 'operand')
+NODE_TYPE_INDEX = {name: i for i, name in enumerate(NODE_TYPES)}
+
+
+def node_type(name):
+    """把节点标签归入NODE_TYPES中的一类"""
+    if name in NODE_TYPE_INDEX:
+        return name
+    if name.startswith('arg: '):
+        return 'arg'
+    return 'operand'
+
+
+def node_histogram(tree, excluded=()):
+    """统计代码树中各类节点的数量（跳过excluded中的节点下标），返回与NODE_TYPES等长的列表"""
+    counts_by_label = {}
+    for index, label in enumerate(tree.compact.labels):
+        if index not in excluded:
+            counts_by_label[label] = counts_by_label.get(label, 0) + 1
+
+    histogram = [0] * len(NODE_TYPES)
+    for label, count in counts_by_label.items():
+        histogram[NODE_TYPE_INDEX[node_type(LABELS.lookup(label))]] += count
+    return histogram
+
+
+def subtree_hashes(tree, min_nodes=3):
+    """节点数不少于min_nodes的子树结构哈希集合"""
+    compact = tree.compact
+    sizes = compact.sizes
+    return {compact.hashes[i] for i in range(len(compact)) if sizes[i] >= min_nodes}
+
+
+def hash_text(text):
+    """字符串的64位稳定哈希"""
+    return int.from_bytes(blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def kgram_hashes(tokens, k=5):
+    """对token文本序列的每个长度为k的窗口计算哈希，返回与窗口起点一一对应的列表"""
+    texts = [text for text, _ in tokens]
+    return [hash_text('\0'.join(texts[i:i + k])) for i in range(len(texts) - k + 1)]
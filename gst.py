@@ -0,0 +1,121 @@
+from collections import namedtuple
+from winnow import Match, MODULUS, BASE
+
+# ====================
+# Greedy String Tiling（JPlag）：反复寻找两份token流中最长的未标记公共片段并标记为"瓦片"，
+# 用Running-Karp-Rabin哈希只比较哈希相同的位置，期望时间接近线性
+# ====================
+
+# 比较结果：重复率 2*覆盖token数/(n+m)，以及按长度降序排列的瓦片（Match）
+TilingResult = namedtuple('TilingResult', ['similarity', 'tiles'])
+
+
+def _encode(tokens1, tokens2):
+    """把token文本映射为整数，两份代码共用同一张表"""
+    ids = {}
+    return ([ids.setdefault(text, len(ids) + 1) for text, _ in tokens1],
+            [ids.setdefault(text, len(ids) + 1) for text, _ in tokens2])
+
+
+def _window_hashes(seq, marked, length):
+    """所有不含已标记token、长度为length的窗口的Karp-Rabin哈希，返回[(起点, 哈希)]"""
+    result = []
+    top = pow(BASE, length - 1, MODULUS)
+    run = 0  # 以当前位置结尾的连续未标记token数
+    h = 0
+    for i, value in enumerate(seq):
+        if marked[i]:
+            run = 0
+            h = 0
+            continue
+        if run >= length:
+            h = (h - seq[i - length] * top) % MODULUS
+        h = (h * BASE + value) % MODULUS
+        run += 1
+        if run >= length:
+            result.append((i - length + 1, h))
+    return result
+
+
+def _scan(seq1, seq2, marked1, marked2, length):
+    """找出所有长度不小于length的最大未标记公共片段，返回(最长长度, [(长度, 起点1, 起点2)])"""
+    table = {}
+    for start, h in _window_hashes(seq2, marked2, length):
+        table.setdefault(h, []).append(start)
+
+    n, m = len(seq1), len(seq2)
+    longest = 0
+    matches = []
+    for start1, h in _window_hashes(seq1, marked1, length):
+        for start2 in table.get(h, ()):
+            # 前一个token也相同且未标记时，该位置处在从更左侧开始的匹配之内，由那里延伸即可
+            if (start1 and start2 and seq1[start1 - 1] == seq2[start2 - 1]
+                    and not marked1[start1 - 1] and not marked2[start2 - 1]):
+                continue
+            # 哈希相同后逐个比较并尽量向后延伸
+            k = 0
+            while (start1 + k < n and start2 + k < m and seq1[start1 + k] == seq2[start2 + k]
+                   and not marked1[start1 + k] and not marked2[start2 + k]):
+                k += 1
+            if k >= length:
+                matches.append((k, start1, start2))
+                longest = max(longest, k)
+    return longest, matches
+
+
+def tile(tokens1, tokens2, min_match=9, initial_search=20):
+    """对两份代码的token流做Greedy String Tiling
+
+    参数:
+        tokens1, tokens2 (list): CodeTree.normalized_tokens()的结果
+        min_match (int): 瓦片的最小长度，更短的公共片段不计入
+        initial_search (int): 初始搜索长度，之后按最长匹配调整并逐步减半
+
+    返回:
+        TilingResult
+    """
+    seq1, seq2 = _encode(tokens1, tokens2)
+    marked1 = [False] * len(seq1)
+    marked2 = [False] * len(seq2)
+    tiles = []
+
+    length = max(initial_search, min_match)
+    while length >= min_match:
+        longest, matches = _scan(seq1, seq2, marked1, marked2, length)
+        if longest > 2 * length:
+            # 存在远长于当前搜索长度的匹配，用更长的窗口重新扫描以减少候选
+            length = longest
+            continue
+
+        # 从长到短标记互不重叠的匹配
+        matches.sort(key=lambda x: (-x[0], x[1], x[2]))
+        marked_any = False
+        for k, start1, start2 in matches:
+            if any(marked1[start1:start1 + k]) or any(marked2[start2:start2 + k]):
+                continue
+            marked_any = True
+            for offset in range(k):
+                marked1[start1 + offset] = True
+                marked2[start2 + offset] = True
+            tiles.append(Match((start1, start1 + k), (start2, start2 + k),
+                               (tokens1[start1][1], tokens1[start1 + k - 1][1]),
+                               (tokens2[start2][1], tokens2[start2 + k - 1][1])))
+
+        if length > 2 * min_match:
+            length //= 2
+        elif length > min_match:
+            length = min_match
+        elif not marked_any:
+            # 与已标记瓦片重叠而被跳过的匹配，其未标记部分可能仍不短于min_match，
+            # 最短长度反复扫描，直到不再标记新瓦片
+            break
+
+    total = len(seq1) + len(seq2)
+    covered = sum(end - start for start, end in (t.tokens1 for t in tiles))
+    tiles.sort(key=lambda t: (t.tokens1[0] - t.tokens1[1], t.tokens1[0]))
+    return TilingResult(2 * covered / total if total else 0.0, tiles)
+
+
+def tile_trees(tree1, tree2, min_match=9):
+    """对两棵代码树对应的源代码做Greedy String Tiling"""
+    return tile(tree1.normalized_tokens(), tree2.normalized_tokens(), min_match)
@@ -0,0 +1,124 @@
+import math
+import weakref
+
+# ====================
+# 子集树核（Collins–Duffy）：统计两棵树共有的树片段（按片段大小以decay衰减）
+#   C(n1, n2) = 0                                   产生式不同
+#             = decay * Π_j (1 + C(ch_j(n1), ch_j(n2)))  产生式相同
+# C随子节点序列长度指数增长，长函数体一个节点的片段数就会压倒全树，插入一条语句即可使得分归零；
+# 因此每个节点对按自身片段数归一化，S(n1, n2) = C(n1, n2) / sqrt(C(n1, n1) * C(n2, n2))，取值0~1：
+#   S(n1, n2) = Π_j (q(ch_j(n1)) * q(ch_j(n2)) + S(ch_j(n1), ch_j(n2)) * r(ch_j(n1)) * r(ch_j(n2)))
+#   其中 q(n) = 1/sqrt(1 + C(n, n))，r(n) = sqrt(C(n, n) / (1 + C(n, n)))，C(n, n)在对数空间计算以免溢出
+#   K(T1, T2) = Σ S(n1, n2)
+# 产生式 = 节点标签 + 子节点标签序列，只有产生式相同的节点对才参与计算；
+# S只取决于两棵子树的结构，结构相同的子树（哈希相同）合并计数，S = 1
+# ====================
+
+# 按紧凑树缓存（紧凑树不可变，可被多个CodeTree共享）
+_productions = weakref.WeakKeyDictionary()  # 紧凑树 -> {产生式: {子树哈希: [节点下标, 出现次数]}}
+_factors = weakref.WeakKeyDictionary()  # 紧凑树 -> {decay: (q, r)}
+_self_kernels = weakref.WeakKeyDictionary()  # 紧凑树 -> {decay: K(T, T)}
+
+
+def productions(compact):
+    """按产生式对节点分组，组内按子树结构合并，记录一个代表节点和出现次数"""
+    groups = _productions.get(compact)
+    if groups is None:
+        labels = compact.labels
+        hashes = compact.hashes
+        groups = {}
+        for idx in range(len(compact)):
+            key = (labels[idx], tuple(labels[child] for child in compact.children(idx)))
+            subtrees = groups.setdefault(key, {})
+            entry = subtrees.get(hashes[idx])
+            if entry is None:
+                subtrees[hashes[idx]] = [idx, 1]
+            else:
+                entry[1] += 1
+        _productions[compact] = groups
+    return groups
+
+
+def _softplus(x):
+    """log(1 + e^x)，x很大时不溢出"""
+    return x + math.log1p(math.exp(-x)) if x > 0 else math.log1p(math.exp(x))
+
+
+def node_factors(compact, decay=0.2):
+    """各节点的q、r（见模块说明），按下标降序（子节点先于父节点）由log C(n, n)算出"""
+    cache = _factors.setdefault(compact, {})
+    factors = cache.get(decay)
+    if factors is None:
+        n = len(compact)
+        log_decay = math.log(decay)
+        log_self = [0.0] * n  # log C(n, n)
+        q = [0.0] * n
+        r = [0.0] * n
+        for idx in range(n - 1, -1, -1):
+            value = log_decay + sum(_softplus(log_self[child]) for child in compact.children(idx))
+            log_self[idx] = value
+            log_total = _softplus(value)  # log(1 + C(n, n))
+            q[idx] = math.exp(-0.5 * log_total)
+            r[idx] = math.exp(0.5 * (value - log_total))
+        factors = cache[decay] = (q, r)
+    return factors
+
+
+def tree_kernel(tree1, tree2, decay=0.2):
+    """两棵紧凑树的归一化子集树核 K(T1, T2) = Σ S(n1, n2)"""
+    groups1 = productions(tree1)
+    groups2 = productions(tree2)
+    q1, r1 = node_factors(tree1, decay)
+    q2, r2 = node_factors(tree2, decay)
+    hashes1 = tree1.hashes
+    hashes2 = tree2.hashes
+
+    # 按子树高度升序处理，保证子节点对的S先于父节点对算出
+    heights = tree1.heights
+    order = sorted((heights[idx], idx, key) for key, subtrees in groups1.items() if key in groups2
+                   for idx, _ in subtrees.values())
+    memo = {}  # (子树哈希1, 子树哈希2) -> S，未出现的为0
+    total = 0.0
+    for _, idx1, key in order:
+        h1 = hashes1[idx1]
+        count1 = groups1[key][h1][1]
+        children1 = tree1.children(idx1)
+        for h2, (idx2, count2) in groups2[key].items():
+            value = 1.0
+            if h1 != h2:
+                for child1, child2 in zip(children1, tree2.children(idx2)):
+                    value *= (q1[child1] * q2[child2]
+                              + memo.get((hashes1[child1], hashes2[child2]), 0.0) * r1[child1] * r2[child2])
+            memo[(h1, h2)] = value
+            total += count1 * count2 * value
+    return total
+
+
+def self_kernel(compact, decay=0.2):
+    """K(T, T)，每棵树每个decay只计算一次"""
+    cache = _self_kernels.setdefault(compact, {})
+    value = cache.get(decay)
+    if value is None:
+        value = cache[decay] = tree_kernel(compact, compact, decay)
+    return value
+
+
+def normalized_kernel(tree1, tree2, decay=0.2):
+    """归一化核 K(T1, T2) / sqrt(K(T1, T1) * K(T2, T2))，取值0~1"""
+    norm = math.sqrt(self_kernel(tree1, decay) * self_kernel(tree2, decay))
+    if norm == 0:
+        return 0.0
+    return min(tree_kernel(tree1, tree2, decay) / norm, 1.0)
+
+
+def gram_matrix(trees, decay=0.2):
+    """一组紧凑树两两之间的归一化核矩阵（对角线为1），每棵树的自核只计算一次"""
+    n = len(trees)
+    norms = [math.sqrt(self_kernel(tree, decay)) for tree in trees]
+    matrix = [[1.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            norm = norms[i] * norms[j]
+            value = min(tree_kernel(trees[i], trees[j], decay) / norm, 1.0) if norm else 0.0
+            matrix[i][j] = matrix[j][i] = value
+    return matrix
@@ -0,0 +1,52 @@
+# ====================
+# 位并行最长公共子序列（Allison–Dix / Hyyrö）：序列1的每个位置对应大整数中的一位，
+# 序列2每前进一个元素只需几次大整数运算，总代价O(n·m/64)
+# ====================
+
+
+def match_masks(seq):
+    """每个元素在序列中出现位置的位掩码：元素 -> 整数（第i位为1表示seq[i]等于该元素）"""
+    positions = {}
+    for i, value in enumerate(seq):
+        positions.setdefault(value, []).append(i)
+
+    size = (len(seq) + 7) // 8
+    masks = {}
+    for value, where in positions.items():
+        bits = bytearray(size)
+        for i in where:
+            bits[i >> 3] |= 1 << (i & 7)
+        masks[value] = int.from_bytes(bits, 'little')
+    return masks
+
+
+def lcs_length(seq1, seq2, masks=None):
+    """两个序列的最长公共子序列长度
+
+    参数:
+        seq1, seq2: 元素可哈希的序列
+        masks (dict): 可选，预先算好的match_masks(seq1)
+    """
+    n = len(seq1)
+    if n == 0 or not seq2:
+        return 0
+    if masks is None:
+        masks = match_masks(seq1)
+
+    full = (1 << n) - 1
+    v = full  # 为0的位表示该位置已计入公共子序列
+    for value in seq2:
+        u = v & masks.get(value, 0)
+        v = ((v + u) | (v - u)) & full
+    return n - v.bit_count()
+
+
+def lcs_similarity(seq1, seq2):
+    """重复率 2*LCS/(n+m)"""
+    total = len(seq1) + len(seq2)
+    if total == 0:
+        return 0.0
+    # 较短的序列作为位向量，每次运算的整数更短
+    if len(seq1) > len(seq2):
+        seq1, seq2 = seq2, seq1
+    return 2 * lcs_length(seq1, seq2) / total
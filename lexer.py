@@ -0,0 +1,95 @@
+import re
+from collections import namedtuple
+
+# 词法单元：种类、文本、行号（从1开始）、列号（从1开始）
+Token = namedtuple('Token', ['kind', 'text', 'line', 'column'])
+
+# 主正则：各分支按出现频率排列，相邻匹配首尾相接覆盖整个输入；
+# 未闭合的注释/字符串/字符常量延伸到文件末尾。
+# 不使用捕获组，findall直接返回字符串列表，种类由首字符判断
+TOKEN_PATTERN = re.compile(r'''
+    [ \t\r\f\v]+                                # 空白
+  | \n                                          # 换行
+  | [A-Za-z_][A-Za-z0-9_]*(?!\w)                # 标识符/关键字
+  | [()\[\]{},;.\#]                             # 分隔符
+  | /\*.*?(?:\*/|\Z) | //[^\n]*                 # 注释
+  | \+\+ | -- | -> | <<= | >>= | << | >> | && | \|\|
+  | [-+*/%&|^=!<>]= | [-+*/%&|^=!<>~?:]         # 运算符
+  | \d[\w.]*                                    # 数字
+  | "(?:\\.|[^"\\])*(?:"|\Z)                    # 字符串
+  | '(?:\\.|[^'\\])*(?:'|\Z)                    # 字符常量
+  | \w+                                         # 其他单词（如非ASCII字符）
+  | .
+''', re.VERBOSE | re.DOTALL)
+
+# 首字符 -> 词法单元种类
+FIRST_CHAR_KIND = {}
+FIRST_CHAR_KIND.update(dict.fromkeys(' \t\r\f\v', 'space'))
+FIRST_CHAR_KIND['\n'] = 'newline'
+FIRST_CHAR_KIND.update(dict.fromkeys('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_', 'ident'))
+FIRST_CHAR_KIND.update(dict.fromkeys('0123456789', 'number'))
+FIRST_CHAR_KIND.update(dict.fromkeys('()[]{},;.#', 'punct'))
+FIRST_CHAR_KIND.update(dict.fromkeys('+-*/%&|^=!<>~?:', 'op'))
+FIRST_CHAR_KIND['"'] = 'string'
+FIRST_CHAR_KIND["'"] = 'char'
+
+# 拼接token时需要以空格隔开的相邻字符：单词字符之间、运算符字符之间
+WORD_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_0123456789')
+OPERATOR_CHARS = frozenset('+-*/%&|^=!<>~?:')
+
+# 不携带代码含义的词法单元
+TRIVIA = frozenset(('comment', 'space', 'newline'))
+# 可能包含换行符的词法单元
+MULTILINE = frozenset(('newline', 'comment', 'string', 'char'))
+
+
+def token_kind(text):
+    """根据词法单元文本判断种类"""
+    kind = FIRST_CHAR_KIND.get(text[0], 'word')
+    if kind == 'ident':
+        # 含非ASCII字符的单词不是C标识符
+        return kind if text.isascii() else 'word'
+    if text[0] == '/' and text[:2] in ('//', '/*'):
+        return 'comment'
+    return kind
+
+
+def scan(code):
+    """一次扫描把代码切分为词法单元文本列表，拼接后与原代码完全相同"""
+    return TOKEN_PATTERN.findall(code)
+
+
+def tokenize(code, texts=None):
+    """生成带种类和位置信息的词法单元列表（可复用已有的scan结果）"""
+    if texts is None:
+        texts = scan(code)
+    tokens = []
+    append = tokens.append
+    make = tuple.__new__  # 直接构造Token，省去namedtuple.__new__的调用开销
+    line = 1
+    line_start = 0  # 当前行首字符的偏移
+    offset = 0
+    for text in texts:
+        kind = token_kind(text)
+        append(make(Token, (kind, text, line, offset - line_start + 1)))
+        # 换行符、多行注释和跨行字符串会推进行号
+        if kind in MULTILINE:
+            newlines = text.count('\n')
+            if newlines:
+                line += newlines
+                line_start = offset + text.rfind('\n') + 1
+        offset += len(text)
+    return tokens
+
+
+def join_tokens(texts):
+    """把token拼接成表达式文本：只在拼接后会粘连成别的token处加空格，与原代码的排版无关"""
+    parts = []
+    prev = ''
+    for text in texts:
+        if prev and ((prev[-1] in WORD_CHARS and text[0] in WORD_CHARS) or
+                     (prev[-1] in OPERATOR_CHARS and text[0] in OPERATOR_CHARS)):
+            parts.append(' ')
+        parts.append(text)
+        prev = text
+    return ''.join(parts)
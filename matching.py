@@ -0,0 +1,149 @@
+# ====================
+# 二分图匹配：Hopcroft–Karp最大匹配（稀疏图）与按类别合并节点的最大权匹配（最小费用流）
+# ====================
+
+
+def hopcroft_karp(adjacency, n_right):
+    """二分图最大匹配
+
+    参数:
+        adjacency (list): adjacency[u]为左侧节点u可匹配的右侧节点列表（可在多个u之间共享）
+        n_right (int): 右侧节点数
+
+    返回:
+        list: match_left，match_left[u]为u匹配的右侧节点（-1表示未匹配）
+    """
+    n_left = len(adjacency)
+    match_left = [-1] * n_left
+    match_right = [-1] * n_right
+
+    # 先贪心得到初始匹配，减少增广轮数
+    for u in range(n_left):
+        for v in adjacency[u]:
+            if match_right[v] == -1:
+                match_left[u] = v
+                match_right[v] = u
+                break
+
+    while True:
+        # BFS：从未匹配的左侧节点出发分层
+        dist = [-1] * n_left
+        queue = [u for u in range(n_left) if match_left[u] == -1]
+        for u in queue:
+            dist[u] = 0
+        found = False
+        for u in queue:
+            for v in adjacency[u]:
+                w = match_right[v]
+                if w == -1:
+                    found = True
+                elif dist[w] == -1:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+        if not found:
+            return match_left
+
+        # DFS：沿分层图寻找互不相交的最短增广路（迭代实现，避免递归过深）
+        cursor = [0] * n_left
+        for root in range(n_left):
+            if match_left[root] != -1:
+                continue
+            stack = [root]
+            via = []  # via[k]：从stack[k]走到stack[k+1]经过的右侧节点
+            while stack:
+                u = stack[-1]
+                edges = adjacency[u]
+                advanced = False
+                while cursor[u] < len(edges):
+                    v = edges[cursor[u]]
+                    cursor[u] += 1
+                    w = match_right[v]
+                    if w == -1:
+                        # 找到增广路：沿路翻转匹配
+                        via.append(v)
+                        for left, right in zip(stack, via):
+                            match_left[left] = right
+                            match_right[right] = left
+                        stack = []
+                        advanced = True
+                        break
+                    if dist[w] == dist[u] + 1:
+                        stack.append(w)
+                        via.append(v)
+                        advanced = True
+                        break
+                if not advanced:
+                    dist[u] = -1  # 此节点之后不再可达
+                    stack.pop()
+                    if via:
+                        via.pop()
+
+
+def max_weight_transport(supply, demand, weights):
+    """容量版最大权匹配（运输问题）：左侧第i类有supply[i]个相同节点，右侧第j类有demand[j]个
+
+    大量节点只分为少数几类时（如按深度分类），等价于展开后逐个节点的最大权匹配，
+    但规模只与类别数有关。用逐次最短增广路求最小费用流，路径费用不再为负时停止
+
+    参数:
+        supply (list): 左侧各类的节点数
+        demand (list): 右侧各类的节点数
+        weights (dict): {(i, j): 正权重}，未列出的类别对不能匹配
+
+    返回:
+        float: 最大权重之和
+    """
+    n, m = len(supply), len(demand)
+    source, sink = n + m, n + m + 1
+    # 残量图：每条边为[终点, 剩余容量, 费用, 反向边下标]
+    graph = [[] for _ in range(n + m + 2)]
+
+    def add_edge(a, b, capacity, cost):
+        graph[a].append([b, capacity, cost, len(graph[b])])
+        graph[b].append([a, 0, -cost, len(graph[a]) - 1])
+
+    for i, count in enumerate(supply):
+        add_edge(source, i, count, 0.0)
+    for j, count in enumerate(demand):
+        add_edge(n + j, sink, count, 0.0)
+    for (i, j), weight in weights.items():
+        add_edge(i, n + j, min(supply[i], demand[j]), -weight)
+
+    total = 0.0
+    while True:
+        # Bellman–Ford（SPFA）：残量图中有负费用边，但不存在负环
+        dist = [float('inf')] * len(graph)
+        prev = [None] * len(graph)  # (前驱节点, 边下标)
+        in_queue = [False] * len(graph)
+        dist[source] = 0.0
+        queue = [source]
+        head = 0
+        while head < len(queue):
+            a = queue[head]
+            head += 1
+            in_queue[a] = False
+            for k, (b, capacity, cost, _) in enumerate(graph[a]):
+                if capacity > 0 and dist[a] + cost < dist[b] - 1e-12:
+                    dist[b] = dist[a] + cost
+                    prev[b] = (a, k)
+                    if not in_queue[b]:
+                        in_queue[b] = True
+                        queue.append(b)
+        if dist[sink] >= -1e-12:
+            return total
+
+        # 沿最短路增广瓶颈容量
+        flow = None
+        b = sink
+        while b != source:
+            a, k = prev[b]
+            flow = graph[a][k][1] if flow is None else min(flow, graph[a][k][1])
+            b = a
+        b = sink
+        while b != source:
+            a, k = prev[b]
+            edge = graph[a][k]
+            edge[1] -= flow
+            graph[b][edge[3]][1] += flow
+            b = a
+        total -= flow * dist[sink]
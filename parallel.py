@@ -0,0 +1,137 @@
+import os
+import sys
+import numpy as np
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from CodeTree import CodeTree
+from CompactTree import CompactTree
+from batch import read_source
+
+# ====================
+# 多进程并行计算重复率矩阵：紧凑树序列化后放入共享内存，各进程按需解码
+# ====================
+
+# 工作进程内的全局状态
+_shared = None  # 共享内存块
+_offsets = None  # 第i棵树位于[_offsets[i], _offsets[i+1])
+_trees = {}  # 已解码的树：下标 -> CodeTree
+
+
+def parse_file(path):
+    """工作进程：解析单个文件，返回序列化的紧凑树（失败返回错误信息）"""
+    tree = CodeTree()
+    try:
+        tree.build_tree(read_source(path))
+    except Exception as e:
+        return None, str(e)
+    return tree.compact.dumps(), None
+
+
+def _attach(shm_name, offsets):
+    """工作进程初始化：连接共享内存"""
+    global _shared, _offsets
+    _shared = shared_memory.SharedMemory(name=shm_name)
+    _offsets = offsets
+    _trees.clear()
+
+
+def _tree(index):
+    """从共享内存解码第index棵树（每个进程只解码一次）"""
+    tree = _trees.get(index)
+    if tree is None:
+        compact = CompactTree.loads(_shared.buf[_offsets[index]:_offsets[index + 1]])
+        tree = CodeTree()
+        tree.load_compact(compact)
+        _trees[index] = tree
+    return tree
+
+
+def _score_rows(row_start, row_end, mode):
+    """工作进程：计算上三角中[row_start, row_end)各行的重复率"""
+    n = len(_offsets) - 1
+    scores = array('d')
+    for i in range(row_start, row_end):
+        tree1 = _tree(i)
+        for j in range(i + 1, n):
+            scores.append(tree1.calculate_similarity(_tree(j), mode=mode))
+    return row_start, row_end, scores
+
+
+def split_rows(n, chunks):
+    """把上三角按行切分成约chunks块，使每块的文件对数量大致相同"""
+    total = n * (n - 1) // 2
+    target = max(1, total // max(1, chunks))
+    ranges = []
+    start = 0
+    count = 0
+    for i in range(n):
+        count += n - 1 - i
+        if count >= target or i == n - 1:
+            ranges.append((start, i + 1))
+            start = i + 1
+            count = 0
+    return ranges
+
+
+def similarity_matrix(paths, jobs=None, mode='bucket', chunks_per_job=4, log=sys.stderr):
+    """并行解析并计算所有文件两两之间的重复率
+
+    返回:
+        (list, numpy.ndarray): 成功建树的文件路径，以及对称的重复率矩阵（对角线为1）
+    """
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        parsed = list(pool.map(parse_file, paths, chunksize=max(1, len(paths) // (jobs * 4))))
+
+    valid_paths = []
+    payloads = []
+    for path, (payload, error) in zip(paths, parsed):
+        if payload is None:
+            print(f"跳过 {path}: {error}", file=log)
+            continue
+        valid_paths.append(path)
+        payloads.append(payload)
+
+    n = len(payloads)
+    matrix = np.eye(n, dtype=np.float64)
+    if n < 2:
+        return valid_paths, matrix
+
+    # 所有树依次写入一块共享内存，工作进程不再为每个任务重复传输树
+    offsets = [0]
+    for payload in payloads:
+        offsets.append(offsets[-1] + len(payload))
+    shm = shared_memory.SharedMemory(create=True, size=offsets[-1])
+    try:
+        for payload, start in zip(payloads, offsets):
+            shm.buf[start:start + len(payload)] = payload
+
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_attach, initargs=(shm.name, offsets)) as pool:
+            futures = [pool.submit(_score_rows, start, end, mode)
+                       for start, end in split_rows(n, jobs * chunks_per_job)]
+            for future in futures:
+                row_start, row_end, scores = future.result()
+                pos = 0
+                for i in range(row_start, row_end):
+                    width = n - 1 - i
+                    matrix[i, i + 1:] = scores[pos:pos + width]
+                    pos += width
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # 补全下三角
+    upper = np.triu(matrix, 1)
+    matrix = upper + upper.T + np.eye(n)
+    return valid_paths, matrix
+
+
+def serial_similarity_matrix(trees, mode='bucket'):
+    """单进程计算重复率矩阵，作为并行结果的参照"""
+    n = len(trees)
+    matrix = np.eye(n, dtype=np.float64)
+    for i in range(n):
+        for j in range(i + 1, n):
+            matrix[i, j] = matrix[j, i] = trees[i].calculate_similarity(trees[j], mode=mode)
+    return matrix
@@ -0,0 +1,100 @@
+from array import array
+from hashlib import blake2b
+from CompactTree import LABELS, combine_hash
+
+# ====================
+# pq-gram轮廓：每个节点的p个祖先（含自身）与q个相邻子节点组成一个pq-gram，
+# 轮廓是所有pq-gram哈希排好序的数组，两棵树的距离只需一次线性归并
+# ====================
+
+# 补齐用的空标签，不与任何节点标签的哈希相同
+DUMMY = int.from_bytes(blake2b(b'\0pq-gram dummy', digest_size=8).digest(), 'little')
+
+
+def profile(compact, p=2, q=3):
+    """计算紧凑树的pq-gram轮廓，返回升序的array('Q')
+
+    共n+(q-1)*内部节点数个pq-gram，排序后总代价O(n log n)
+    """
+    n = len(compact)
+    label_hashes = [LABELS.hash_of(label) for label in compact.labels]
+    parents = compact.parents
+    first_child = compact.first_child
+    next_sibling = compact.next_sibling
+
+    grams = []
+    for idx in range(n):
+        # 主干：从上到下p个祖先，不足时用空标签补齐
+        stem = []
+        node = idx
+        while len(stem) < p:
+            stem.append(label_hashes[node] if node != -1 else DUMMY)
+            if node != -1:
+                node = parents[node]
+        stem.reverse()
+
+        # 基底：子节点序列两侧各补q-1个空标签后，取所有长为q的窗口
+        child = first_child[idx]
+        if child == -1:
+            grams.append(combine_hash(stem[0], stem[1:] + [DUMMY] * q))
+            continue
+        base = [DUMMY] * (q - 1)
+        while child != -1:
+            base.append(label_hashes[child])
+            child = next_sibling[child]
+        base.extend([DUMMY] * (q - 1))
+        for start in range(len(base) - q + 1):
+            grams.append(combine_hash(stem[0], stem[1:] + base[start:start + q]))
+
+    grams.sort()
+    return array('Q', grams)
+
+
+def shared_count(profile1, profile2):
+    """两个升序轮廓的多重集交集大小（线性归并）"""
+    i = j = shared = 0
+    len1, len2 = len(profile1), len(profile2)
+    while i < len1 and j < len2:
+        a, b = profile1[i], profile2[j]
+        if a == b:
+            shared += 1
+            i += 1
+            j += 1
+        elif a < b:
+            i += 1
+        else:
+            j += 1
+    return shared
+
+
+def distance(profile1, profile2):
+    """pq-gram距离：1 - 2|P1∩P2| / (|P1|+|P2|)，取值0~1"""
+    total = len(profile1) + len(profile2)
+    if total == 0:
+        return 0.0
+    return 1.0 - 2 * shared_count(profile1, profile2) / total
+
+
+def build_index(profiles):
+    """倒排索引：pq-gram哈希 -> 含有它的轮廓编号列表（编号即profiles中的下标）"""
+    index = {}
+    for number, prof in enumerate(profiles):
+        last = None
+        for gram in prof:
+            if gram != last:
+                index.setdefault(gram, []).append(number)
+                last = gram
+    return index
+
+
+def query_index(index, prof, limit=10):
+    """在倒排索引中查找与prof共享pq-gram种类最多的轮廓，返回[(编号, 共享种类数)]"""
+    counts = {}
+    last = None
+    for gram in prof:
+        if gram == last:
+            continue
+        last = gram
+        for number in index.get(gram, ()):
+            counts[number] = counts.get(number, 0) + 1
+    return sorted(counts.items(), key=lambda x: (-x[1], x[0]))[:limit]
@@ -0,0 +1,46 @@
+import numpy as np
+from fingerprint import node_histogram
+
+# ====================
+# 节点类型直方图预筛：一次性算出所有文件对重复率的上界，只有上界达到阈值的文件对才精确比较
+#
+# 两个节点能匹配的前提是标签相同，因而同类节点的匹配数不超过两边该类数量的较小者：
+#   2*匹配数/总节点数 <= 2*Σmin(h1, h2)/(|h1|+|h2|) = 1 - L1(h1, h2)/(|h1|+|h2|)
+# ====================
+
+# 上界适用的相似度模式
+BOUNDED_MODES = ('bucket', 'greedy', 'optimal', 'weighted', 'lcs')
+# 设置了教师模板时上界适用的模式：直方图不计模板节点，而'lcs'对全部节点计分
+TEMPLATE_BOUNDED_MODES = ('bucket', 'greedy', 'optimal', 'weighted')
+
+
+def histogram_matrix(trees):
+    """把每棵树的节点类型直方图堆叠为 文件数 × 类型数 的矩阵（属于教师模板的节点不计入）"""
+    return np.array([node_histogram(tree, tree._excluded_nodes()) for tree in trees],
+                    dtype=np.int64).reshape(len(trees), -1)
+
+
+def upper_bounds(histograms, chunk=256):
+    """所有文件对重复率的上界矩阵（对角线为1）
+
+    按行分块广播，内存占用为 chunk × 文件数 × 类型数
+    """
+    n = len(histograms)
+    totals = histograms.sum(axis=1)
+    bounds = np.ones((n, n), dtype=np.float64)
+    for start in range(0, n, chunk):
+        block = histograms[start:start + chunk]
+        shared = np.minimum(block[:, None, :], histograms[None, :, :]).sum(axis=2)
+        total = totals[start:start + chunk, None] + totals[None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bounds[start:start + chunk] = np.where(total > 0, (2 * shared) / total, 0.0)
+    return np.minimum(bounds, 1.0)
+
+
+def candidate_pairs(histograms, threshold, pairs=None):
+    """上界不低于threshold的下标对（默认在上三角全部文件对中筛选）"""
+    bounds = upper_bounds(histograms)
+    if pairs is None:
+        rows, cols = np.nonzero(np.triu(bounds >= threshold, 1))
+        return list(zip(rows.tolist(), cols.tolist()))
+    return [(i, j) for i, j in pairs if bounds[i, j] >= threshold]
@@ -0,0 +1,176 @@
+import numpy as np
+
+# ====================
+# 有序树编辑距离（Zhang–Shasha）：插入、删除、改名代价均为1
+#
+# 固定tree1的一个关键根时，tree2所有关键根子问题的森林距离表按列拼接成一行，
+# 每行只需一组向量运算；行内"插入"的依赖用分段前缀最小值一次求出
+# ====================
+
+# 复用的动态规划缓冲区，只在规模变大时重新分配
+_forest_buffer = np.zeros(0, dtype=np.int64)
+_tree_buffer = np.zeros(0, dtype=np.int32)
+
+
+def _buffer(current, size):
+    if current.size < size:
+        current = np.zeros(size, dtype=current.dtype)
+    return current
+
+
+def postorder(compact):
+    """把先序存储的紧凑树转换为后序：返回(标签id数组, 最左叶子数组, 关键根列表)"""
+    n = len(compact)
+    sizes = np.array(compact.sizes, dtype=np.int64)
+    depths = np.array(compact.depths, dtype=np.int64)
+    # 后序编号 = 先序中排在前面的非祖先节点数 + 子孙节点数
+    post = np.arange(n, dtype=np.int64) - depths + sizes - 1
+    labels = np.empty(n, dtype=np.int64)
+    labels[post] = np.array(compact.labels, dtype=np.int64)
+    leftmost = np.empty(n, dtype=np.int64)
+    leftmost[post] = post - sizes + 1
+
+    # 关键根：每个最左叶子对应的编号最大的节点
+    roots = {}
+    for k, leaf in enumerate(leftmost.tolist()):
+        roots[leaf] = k
+    return labels, leftmost, sorted(roots.values())
+
+
+def label_lower_bound(labels1, labels2):
+    """编辑距离下界：max(n, m) - 两棵树标签多重集的交集大小"""
+    ids1, counts1 = np.unique(labels1, return_counts=True)
+    ids2, counts2 = np.unique(labels2, return_counts=True)
+    _, pos1, pos2 = np.intersect1d(ids1, ids2, assume_unique=True, return_indices=True)
+    common = int(np.minimum(counts1[pos1], counts2[pos2]).sum())
+    return max(len(labels1), len(labels2)) - common
+
+
+class _Columns:
+    """tree2所有关键根子问题拼接成的列布局"""
+
+    def __init__(self, labels, leftmost, keyroots, big):
+        """big: 段间间隔，需大于同一段内数值的变化范围"""
+        keyroot_of = {int(leftmost[k]): s for s, k in enumerate(keyroots)}  # 最左叶子 -> 段号
+
+        nodes, local, segment, tree_col, jump = [], [], [], [], []
+        self.levels = []  # 每段依赖的同行段层数
+        self.last = 0  # 最后一段（整棵tree2）的起始位置
+        offset = 0
+        for s, k2 in enumerate(keyroots):
+            l2 = int(leftmost[k2])
+            width = k2 - l2 + 1
+            self.last = offset
+            # 第0列：空森林
+            nodes.append(0)
+            local.append(0)
+            segment.append(s)
+            tree_col.append(False)
+            jump.append(offset)
+            level = 0
+            for c in range(1, width + 1):
+                j = l2 + c - 1
+                leaf = int(leftmost[j])
+                nodes.append(j)
+                local.append(c)
+                segment.append(s)
+                tree_col.append(leaf == l2)
+                jump.append(offset + leaf - l2)
+                if leaf != l2:
+                    level = max(level, self.levels[keyroot_of[leaf]] + 1)
+            self.levels.append(level)
+            offset += width + 1
+
+        self.width = offset
+        self.nodes = np.array(nodes, dtype=np.int64)
+        self.labels = labels[self.nodes]
+        self.local = np.array(local, dtype=np.int64)
+        self.base = self.local + np.array(segment, dtype=np.int64) * big
+        self.tree_col = np.array(tree_col, dtype=bool)
+        self.tree_nodes = self.nodes[self.tree_col]
+        self.first_col = self.local == 0
+        self.jump = np.array(jump, dtype=np.int64)
+        self.diagonal = np.maximum(np.arange(offset) - 1, 0)  # 左上方的位置（第0列不使用）
+        self.rounds = max(self.levels) + 1
+
+
+def _row_cost(leftmost, keyroots):
+    """以该树为行时需要计算的行数"""
+    return sum(k - int(leftmost[k]) + 1 for k in keyroots)
+
+
+def tree_edit_distance(tree1, tree2, max_distance=None):
+    """两棵紧凑树的编辑距离
+
+    参数:
+        tree1, tree2 (CompactTree): 待比较的树
+        max_distance (int): 截断阈值，确定距离超过它时立即返回None
+
+    返回:
+        int: 编辑距离；超过max_distance时为None
+    """
+    global _forest_buffer, _tree_buffer
+    n, m = len(tree1), len(tree2)
+    if n == 0 or m == 0:
+        distance = max(n, m)
+        return None if max_distance is not None and distance > max_distance else distance
+
+    labels1, leftmost1, keyroots1 = postorder(tree1)
+    labels2, leftmost2, keyroots2 = postorder(tree2)
+
+    # 先用廉价的下界排除明显不同的树
+    if max_distance is not None:
+        if abs(n - m) > max_distance or label_lower_bound(labels1, labels2) > max_distance:
+            return None
+
+    # 编辑距离对称：行数少的树作为行，减少Python层循环
+    if _row_cost(leftmost1, keyroots1) > _row_cost(leftmost2, keyroots2):
+        n, labels1, leftmost1, keyroots1, m, labels2, leftmost2, keyroots2 = \
+            m, labels2, leftmost2, keyroots2, n, labels1, leftmost1, keyroots1
+
+    cols = _Columns(labels2, leftmost2, keyroots2, n + m + 2)
+    width = cols.width
+    _tree_buffer = _buffer(_tree_buffer, n * m)
+    _forest_buffer = _buffer(_forest_buffer, (n + 1) * width)
+    treedist = _tree_buffer[:n * m].reshape(n, m)
+    last = slice(cols.last, width)
+    remaining2 = m - cols.local[last]  # 根子问题中tree2尚未处理的节点数
+
+    for k1 in keyroots1:
+        l1 = int(leftmost1[k1])
+        forest = _forest_buffer[:(k1 - l1 + 2) * width].reshape(k1 - l1 + 2, width)
+        forest[0] = cols.local
+        check = max_distance is not None and k1 == n - 1
+
+        for i in range(l1, k1 + 1):
+            r = i - l1 + 1
+            prev = forest[r - 1]
+            row = forest[r]
+            jump_row = forest[leftmost1[i] - l1]
+            deleted = prev + 1
+            is_tree_row = leftmost1[i] == l1
+            # 树情形的行会读到同一行中嵌套较浅的段刚写入的td，按依赖层数重复计算
+            for _ in range(cols.rounds if is_tree_row else 1):
+                # 森林情形：fd[l(i)-1][l(j)-1] + td[i][j]
+                candidate = jump_row[cols.jump] + treedist[i][cols.nodes]
+                if is_tree_row:
+                    # 树情形：fd[i-1][j-1] + 改名代价
+                    rename = prev[cols.diagonal] + (cols.labels != labels1[i])
+                    candidate = np.where(cols.tree_col, rename, candidate)
+                np.minimum(candidate, deleted, out=candidate)
+                candidate[cols.first_col] = r
+                # 插入：fd[r][c] = min_{c'<=c}(cand[c'] + c - c')，各段分别求前缀最小值
+                candidate -= cols.base
+                np.minimum.accumulate(candidate, out=row)
+                row += cols.base
+                if is_tree_row:
+                    treedist[i][cols.tree_nodes] = row[cols.tree_col]
+
+            if check:
+                # 后序前缀的映射只会映到后序前缀，剩余部分至少还要付出两边剩余节点数之差
+                bound = (row[last] + np.abs((n - r) - remaining2)).min()
+                if bound > max_distance:
+                    return None
+
+    distance = int(treedist[n - 1, m - 1])
+    return None if max_distance is not None and distance > max_distance else distance
@@ -0,0 +1,12 @@
+import pytest
+from CodeTree import CodeTree
+
+
+@pytest.fixture
+def build():
+    """由源代码建树的工厂函数"""
+    def build_tree(code):
+        tree = CodeTree()
+        tree.build_tree(code)
+        return tree
+    return build_tree
@@ -1,4 +1,5 @@
 from CodeTree import *
+from anytree import Node, RenderTree
 class CodeTree:
     # 定义C语言关键字和运算符集合
     KEYWORDS = set(keyword.kwlist).union({
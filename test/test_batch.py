@@ -0,0 +1,100 @@
+import io
+import csv
+import json
+import os
+import pytest
+from CodeTree import CodeTree
+from batch import collect_files, build_trees, iter_pairs, histogram_pairs, write_results, main
+
+SOURCES = {
+    'a.c': "int main() {\n    int n = 3;\n    printf(\"%d\", n * n);\n    return 0;\n}",
+    'b.c': "int main() {\n    int m = 3;\n    printf(\"%d\", m * m);\n    return 0;\n}",
+    'sub/c.c': "int main() {\n    for (int i = 0; i < 9; i++) {\n        if (i > 3) break;\n    }\n    return 1;\n}",
+}
+
+
+def make_files(tmp_path):
+    for name, code in SOURCES.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(code, encoding='utf-8')
+    (tmp_path / 'notes.txt').write_text('not c', encoding='utf-8')
+    (tmp_path / 'bad.c').write_text('int x;', encoding='utf-8')
+
+
+def test_collect_files(tmp_path):
+    make_files(tmp_path)
+    names = [os.path.relpath(path, tmp_path) for path in collect_files([str(tmp_path)])]
+    assert names == sorted(['a.c', 'b.c', 'bad.c', os.path.join('sub', 'c.c')])
+    # 通配符与目录混用时去重
+    pattern = str(tmp_path / '*.c')
+    assert collect_files([pattern, str(tmp_path)]) == collect_files([str(tmp_path)])
+
+
+def test_iter_pairs_and_output(tmp_path):
+    make_files(tmp_path)
+    log = io.StringIO()
+    trees = build_trees(collect_files([str(tmp_path)]), log=log)
+    assert len(trees) == 3 and 'bad.c' in log.getvalue()
+
+    results = list(iter_pairs(trees))
+    assert len(results) == 3
+    scores = {(os.path.basename(a), os.path.basename(b)): score for a, b, score in results}
+    assert scores[('a.c', 'b.c')] == 1.0
+    assert scores[('a.c', 'c.c')] < 1.0
+    assert [r[:2] for r in iter_pairs(trees, threshold=0.99)] == [r[:2] for r in results if r[2] >= 0.99]
+
+    output = io.StringIO()
+    write_results(results, output, 'csv')
+    rows = list(csv.reader(io.StringIO(output.getvalue())))
+    assert rows[0] == ['file1', 'file2', 'similarity']
+    assert [row[:2] for row in rows[1:]] == [[a, b] for a, b, _ in results]
+    assert float(rows[1][2]) == round(results[0][2], 6)
+
+    output = io.StringIO()
+    write_results(results, output, 'jsonl')
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(r['file1'], r['file2']) for r in records] == [(a, b) for a, b, _ in results]
+
+
+def test_jobs_warning_for_serial_only_options(tmp_path, capsys):
+    make_files(tmp_path)
+    template = tmp_path / 'skeleton.txt'
+    template.write_text("int main() {\n    return 0;\n}", encoding='utf-8')
+    try:
+        assert main([str(tmp_path), '-j', '2', '-T', str(template), '-f', 'jsonl']) == 0
+    finally:
+        CodeTree.template = None
+    captured = capsys.readouterr()
+    assert '忽略 -j 2' in captured.err and '-T' in captured.err
+    assert len(captured.out.splitlines()) == 3
+
+
+def test_template_restricts_modes(tmp_path, capsys):
+    make_files(tmp_path)
+    template = tmp_path / 'skeleton.txt'
+    template.write_text("int main() {\n    return 0;\n}", encoding='utf-8')
+    # 不支持模板的模式直接拒绝，而不是悄悄对全部节点计分
+    assert main([str(tmp_path), '-m', 'lcs', '-T', str(template)]) == 1
+    assert '-T 不支持 -m lcs' in capsys.readouterr().err
+    assert CodeTree.template is None
+
+    trees = build_trees(collect_files([str(tmp_path)]))
+    pairs = [(0, 1), (0, 2), (1, 2)]
+    try:
+        main([str(tmp_path), '-T', str(template), '-o', str(tmp_path / 'out.csv')])
+        with pytest.raises(ValueError, match='不支持教师模板'):
+            trees[0][1].calculate_similarity(trees[1][1], mode='ted')
+        # 'lcs'对模板节点也计分，排除模板后的直方图不再是它的上界，不能用来筛选
+        assert histogram_pairs(trees, 0.99, 'lcs', pairs) == pairs
+    finally:
+        CodeTree.template = None
+
+
+def test_unknown_mode_is_rejected_before_output(tmp_path, capsys):
+    make_files(tmp_path)
+    with pytest.raises(SystemExit):
+        main([str(tmp_path), '-m', 'bukcet'])
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert 'bukcet' in captured.err
@@ -0,0 +1,81 @@
+import pytest
+from CodeTree import CodeTree
+from CorpusStats import CorpusStats
+
+COMMON = """int main() {
+    int i;
+    for (i = 0; i < 10; i++) {
+        printf("%d", i);
+    }
+    return 0;
+}"""
+
+RARE1 = """int main() {
+    int a = 3;
+    a = a * a + (a - 1) / 2;
+    return 0;
+}"""
+
+RARE2 = """int main() {
+    int b = 5;
+    b = b * b + (b - 1) / 2;
+    return 0;
+}"""
+
+
+def test_document_frequency_and_persistence(tmp_path, build):
+    trees = [build(COMMON), build(RARE1), build(RARE2)]
+    stats = CorpusStats(width=1 << 12)
+    assert stats.add(trees[0].compact, COMMON)
+    assert not stats.add(trees[0].compact, COMMON)  # 同一份提交不重复计数
+    path = str(tmp_path / 'corpus.cms')
+    stats.save(path)
+
+    # 增量更新：读回后继续计入新提交
+    stats = CorpusStats.open(path)
+    for tree, source in zip(trees[1:], (RARE1, RARE2)):
+        stats.add(tree.compact, source)
+    assert stats.documents == 3
+    compact = trees[1].compact
+    assert stats.df(compact.hashes[0]) >= 1
+    # 最后一个节点是return 0的叶子，三份提交都有
+    assert stats.df(compact.hashes[len(compact) - 1]) >= 3
+    assert stats.idf(0x1234) > stats.idf(compact.hashes[len(compact) - 1])
+
+
+def test_identical_structure_counts_per_submission(build):
+    # 只改了变量名的抄袭提交结构相同，仍是两份独立的提交
+    copied = RARE1.replace(' a', ' x').replace('(a', '(x')
+    stats = CorpusStats(width=1 << 12)
+    assert stats.add(build(RARE1).compact, RARE1)
+    assert stats.add(build(copied).compact, copied)
+    assert stats.documents == 2
+    assert stats.df(build(RARE1).compact.hashes[0]) == 2
+
+
+def test_idf_mode_downweights_common_fragments(build):
+    sources = [COMMON.replace('int i;', 'int i;\n' + 'i = 1;\n' * k) for k in range(5)] + [RARE1, RARE2]
+    trees = [build(source) for source in sources]
+    common, (tree1, tree2) = trees[:5], trees[5:]
+    stats = CorpusStats(width=1 << 12)
+    for tree, source in zip(trees, sources):
+        stats.add(tree.compact, source)
+    try:
+        CodeTree.corpus_stats = stats
+        assert tree1.calculate_similarity(tree1, mode='idf') == 1.0
+        # 两份提交共有的return、int等常见片段被降权，罕见的表达式结构权重更高
+        weighted = tree1.calculate_similarity(tree2, mode='idf')
+        assert 0.0 < weighted < 1.0
+        assert tree1.calculate_similarity(common[0], mode='idf') < common[0].calculate_similarity(tree1)
+    finally:
+        CodeTree.corpus_stats = None
+
+
+def test_parser_version_mismatch_is_rejected(tmp_path, monkeypatch, build):
+    path = str(tmp_path / 'corpus.cms')
+    stats = CorpusStats(width=1 << 8)
+    stats.add(build(COMMON).compact, COMMON)
+    stats.save(path)
+    monkeypatch.setattr(CodeTree, 'PARSER_VERSION', CodeTree.PARSER_VERSION + 1)
+    with pytest.raises(ValueError, match='重新统计'):
+        CorpusStats.open(path)
@@ -0,0 +1,75 @@
+import pytest
+from CodeTree import CodeTree
+from FingerprintDB import FingerprintDB
+
+SUM = """int main() {
+    int sum = 0;
+    for (int i = 0; i < 10; i++) {
+        if (i % 2 == 0) {
+            sum = sum + i;
+        }
+    }
+    printf("%d", sum);
+    return 0;
+}"""
+
+RENAMED = """int main() {
+    int total = 0;
+    for (int k = 0; k < 10; k++) {
+        if (k % 2 == 0) {
+            total = total + k;
+        }
+    }
+    printf("%d", total);
+    return 0;
+}"""
+
+OTHER = """int main() {
+    char c;
+    scanf("%c", &c);
+    while (c != 'q') {
+        scanf("%c", &c);
+    }
+    return 1;
+}"""
+
+
+def test_query_ranks_renamed_copy_first():
+    with FingerprintDB(':memory:') as db:
+        db.add('sum.c', SUM)
+        db.add('other.c', OTHER)
+        assert len(db) == 2
+
+        results = db.query(RENAMED)
+        assert results[0][0] == 'sum.c'
+        assert results[0][1] > 0.5
+
+        # 从库中还原的树与现场建树的重复率一致
+        tree1 = CodeTree()
+        tree1.build_tree(RENAMED)
+        tree2 = CodeTree()
+        tree2.build_tree(SUM)
+        assert results[0][2] == tree1.calculate_similarity(tree2)
+
+
+def test_add_same_name_replaces():
+    with FingerprintDB(':memory:') as db:
+        db.add('a.c', SUM)
+        db.add('a.c', OTHER)
+        assert len(db) == 1
+        assert db.query(OTHER)[0][2] == 1.0
+
+
+def test_parser_version_mismatch_is_rejected(tmp_path, monkeypatch):
+    path = str(tmp_path / 'archive.db')
+    with FingerprintDB(path) as db:
+        db.add('sum.c', SUM)
+    with FingerprintDB(path) as db:
+        assert len(db) == 1
+
+    monkeypatch.setattr(CodeTree, 'PARSER_VERSION', CodeTree.PARSER_VERSION + 1)
+    with pytest.raises(ValueError, match='重新建库'):
+        FingerprintDB(path)
+    # 空库直接采用当前版本
+    with FingerprintDB(str(tmp_path / 'empty.db')) as db:
+        assert len(db) == 0
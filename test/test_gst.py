@@ -0,0 +1,69 @@
+import random
+from gst import tile, tile_trees
+from test_winnow import CODE, ONE_LINE
+
+
+def test_identical_streams_form_one_tile():
+    tokens = [(text, 1) for text in "a b c d e f g h i j k l".split()]
+    result = tile(tokens, tokens, min_match=3)
+    assert result.similarity == 1.0
+    assert [t.tokens1 for t in result.tiles] == [(0, 12)]
+
+
+def test_swapped_blocks_are_both_found():
+    block1 = [(text, 1) for text in "a b c d e f".split()]
+    block2 = [(text, 2) for text in "u v w x y z".split()]
+    result = tile(block1 + block2, block2 + block1, min_match=4)
+    assert result.similarity == 1.0
+    assert sorted(t.tokens1 for t in result.tiles) == [(0, 6), (6, 12)]
+    assert sorted(t.lines2 for t in result.tiles) == [(1, 1), (2, 2)]
+
+
+def test_short_matches_are_ignored():
+    tokens1 = [(text, 1) for text in "a b c x y z".split()]
+    tokens2 = [(text, 1) for text in "a b c p q r".split()]
+    assert tile(tokens1, tokens2, min_match=4).tiles == []
+
+
+def test_layout_independent(build):
+    result = tile_trees(build(CODE), build(ONE_LINE), min_match=5)
+    assert result.similarity == 1.0
+    assert result.tiles[0].lines1 == (1, 10)
+    assert result.tiles[0].lines2 == (1, 1)
+
+
+def test_long_identical_streams_form_one_tile():
+    # 只从左侧极大的位置开始延伸，长的相同token流同样得到一个完整瓦片
+    tokens = [(str(i * 7919 % 61), 1) for i in range(8000)]
+    result = tile(tokens, tokens)
+    assert result.similarity == 1.0
+    assert [t.tokens1 for t in result.tiles] == [(0, 8000)]
+
+
+def test_blocked_matches_are_rescanned():
+    tokens1 = [(text, 1) for text in "baabab"]
+    tokens2 = [(text, 1) for text in "babaaa"]
+    result = tile(tokens1, tokens2, min_match=2)
+    assert sorted(t.tokens1 for t in result.tiles) == [(0, 3), (3, 5)]
+    assert abs(result.similarity - 5 / 6) < 1e-12
+
+
+def test_no_common_run_left_unmarked():
+    # 随机的短token流：结束后不应再有不短于min_match的未标记公共片段
+    random.seed(7)
+    for _ in range(300):
+        min_match = random.randint(2, 4)
+        tokens1 = [(random.choice("ab"), 1) for _ in range(random.randint(0, 30))]
+        tokens2 = [(random.choice("ab"), 1) for _ in range(random.randint(0, 30))]
+        result = tile(tokens1, tokens2, min_match=min_match)
+        marked1 = [False] * len(tokens1)
+        marked2 = [False] * len(tokens2)
+        for t in result.tiles:
+            for i in range(*t.tokens1):
+                marked1[i] = True
+            for i in range(*t.tokens2):
+                marked2[i] = True
+        for i in range(len(tokens1) - min_match + 1):
+            for j in range(len(tokens2) - min_match + 1):
+                assert not all(tokens1[i + k] == tokens2[j + k] and not marked1[i + k] and not marked2[j + k]
+                               for k in range(min_match))
@@ -0,0 +1,48 @@
+import math
+from kernel import tree_kernel, gram_matrix
+from test_similarity import build_trees
+
+
+def reference_kernel(tree1, tree2, decay):
+    """按定义对所有节点对递归计算 Σ C(n1, n2) / sqrt(C(n1, n1) * C(n2, n2))"""
+    def production(tree, idx):
+        return tree.labels[idx], [tree.labels[c] for c in tree.children(idx)]
+
+    def common(t1, idx1, t2, idx2):
+        if production(t1, idx1) != production(t2, idx2):
+            return 0.0
+        value = decay
+        for child1, child2 in zip(t1.children(idx1), t2.children(idx2)):
+            value *= 1.0 + common(t1, child1, t2, child2)
+        return value
+
+    return sum(common(tree1, i, tree2, j) / math.sqrt(common(tree1, i, tree1, i) * common(tree2, j, tree2, j))
+               for i in range(len(tree1)) for j in range(len(tree2)))
+
+
+def test_matches_definition():
+    trees = [tree.compact for tree in build_trees()]
+    for tree1 in trees[:3]:
+        for tree2 in trees[:3]:
+            expected = reference_kernel(tree1, tree2, 0.5)
+            assert abs(tree_kernel(tree1, tree2, 0.5) - expected) < 1e-9 * max(1.0, expected)
+
+
+def test_gram_matrix_matches_mode():
+    trees = build_trees()
+    matrix = gram_matrix([tree.compact for tree in trees])
+    for i, tree1 in enumerate(trees):
+        assert matrix[i][i] == 1.0
+        for j, tree2 in enumerate(trees):
+            assert abs(matrix[i][j] - tree1.calculate_similarity(tree2, mode='kernel')) < 1e-12
+            assert matrix[i][j] == matrix[j][i]
+
+
+def test_insertion_into_long_function(build):
+    # 长函数体的片段数随语句数指数增长，不能让函数体一个节点主导得分
+    statements = [f"    x{i} = y * {i} + f(z);\n" for i in range(60)]
+    original = build("int main() {\n" + "".join(statements) + "}\n")
+    inserted = build("int main() {\n" + "".join(statements[:30] + ["    a = b;\n"] + statements[30:]) + "}\n")
+    assert original.calculate_similarity(inserted, mode='kernel') > 0.95
+    other = build("int main() {\n" + "".join(s.replace('+', '-') for s in statements) + "}\n")
+    assert original.calculate_similarity(other, mode='kernel') < 0.95
@@ -0,0 +1,30 @@
+from lcs import lcs_length
+from test_similarity import build_trees
+
+
+def reference_lcs(seq1, seq2):
+    """朴素动态规划"""
+    prev = [0] * (len(seq2) + 1)
+    for a in seq1:
+        cur = [0]
+        for j, b in enumerate(seq2):
+            cur.append(prev[j] + 1 if a == b else max(prev[j + 1], cur[j]))
+        prev = cur
+    return prev[-1]
+
+
+def test_matches_dynamic_programming():
+    cases = [("ABCBDAB", "BDCABA"), ("", "abc"), ("aaaa", "aa"), ("abcdefghij" * 10, "jihgfedcba" * 10)]
+    for seq1, seq2 in cases:
+        assert lcs_length(seq1, seq2) == reference_lcs(seq1, seq2)
+        assert lcs_length(seq2, seq1) == reference_lcs(seq1, seq2)
+
+
+def test_lcs_mode():
+    trees = build_trees()
+    for tree1 in trees:
+        assert tree1.calculate_similarity(tree1, mode='lcs') == 1.0
+        for tree2 in trees:
+            expected = 2 * reference_lcs(tree1.compact.labels, tree2.compact.labels) / \
+                (len(tree1.compact) + len(tree2.compact))
+            assert tree1.calculate_similarity(tree2, mode='lcs') == expected
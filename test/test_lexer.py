@@ -0,0 +1,55 @@
+from CodeTree import CodeTree
+from lexer import scan, tokenize
+
+CODE = """int main() {
+    /* 多行
+       注释 */ char *s = "http://x // y";
+    int a[2] = {1, 2}; // 行注释
+    return a[0] >= 1 ? 'c' : '\\'';
+}"""
+
+
+def test_scan_roundtrip_and_extents():
+    texts = scan(CODE)
+    assert ''.join(texts) == CODE
+    # 注释、字符串和字符常量各自是一个整体
+    assert '/* 多行\n       注释 */' in texts
+    assert '"http://x // y"' in texts
+    assert '// 行注释' in texts
+    assert "'\\''" in texts
+    assert '>=' in texts and '{' in texts
+
+
+def test_tokenize_kinds_and_positions():
+    tokens = [token for token in tokenize(CODE) if token.kind not in ('space', 'newline')]
+    by_text = {token.text: token for token in tokens}
+    assert by_text['main'][1:] == ('main', 1, 5)
+    assert by_text['/* 多行\n       注释 */'].kind == 'comment'
+    # 跨行注释之后的token行号、列号正确
+    assert by_text['char'][2:] == (3, 14)
+    assert by_text['"http://x // y"'].kind == 'string'
+    assert by_text['return'][2:] == (5, 5)
+
+
+def test_unterminated_literals_extend_to_end():
+    assert scan('a = "abc') == ['a', ' ', '=', ' ', '"abc']
+    assert scan('x /* y\nz') == ['x', ' ', '/* y\nz']
+
+
+def test_comment_markers_inside_strings_are_kept():
+    tree = CodeTree()
+    processed = tree.preprocess_code('int main() { printf("a // b"); } // tail')
+    assert '"var // var"' in processed
+    assert 'tail' not in processed
+
+
+def test_bracket_error_positions():
+    tree = CodeTree()
+    # 字符串和注释中的括号不参与匹配
+    code = 'int main() {\n    x = (a[1]));\n    s = "("; // (\n    y = b[2;\n}'
+    errors = [(error['line'], error['position'], error['message']) for error in tree.detect_bracket_errors(code)]
+    assert errors == [(2, 15, "多余的闭括号 ')'"), (4, 10, "未关闭的开括号 '['")]
+
+    errors = tree.detect_bracket_errors('int main() {\n\tf(a];\n}')
+    assert [(error['line'], error['position']) for error in errors] == [(2, 3)]
+    assert errors[0]['message'] == "括号不匹配: '(' 与 ']'"
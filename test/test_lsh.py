@@ -0,0 +1,38 @@
+import os
+import tempfile
+import pytest
+from CodeTree import CodeTree
+from LSHIndex import LSHIndex
+from test_similarity import SAMPLES
+
+
+def test_identical_trees_always_collide(build):
+    with LSHIndex(bands=8, rows=4) as index:
+        for i, code in enumerate(SAMPLES):
+            index.add(f"s{i}", build(code))
+        index.add("copy", build(SAMPLES[2]))
+        assert ("s2", "copy") in index.candidate_pairs()
+        assert index.query(build(SAMPLES[2]))[:2] == ["s2", "copy"]
+        assert index.estimate_jaccard("s2", "copy") == 1.0
+
+
+def test_index_persists_and_keeps_settings(build):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "lsh.db")
+        with LSHIndex(path, bands=4, rows=2) as index:
+            index.add("a", build(SAMPLES[0]))
+        # 重新打开时沿用建库参数，可继续增量插入
+        with LSHIndex(path, bands=99, rows=9) as index:
+            assert (index.bands, index.rows) == (4, 2)
+            index.add("b", build(SAMPLES[0]))
+            assert len(index) == 2
+            assert ("a", "b") in index.candidate_pairs()
+
+
+def test_parser_version_mismatch_is_rejected(tmp_path, monkeypatch, build):
+    path = str(tmp_path / "lsh.db")
+    with LSHIndex(path, bands=4, rows=2) as index:
+        index.add("a", build(SAMPLES[0]))
+    monkeypatch.setattr(CodeTree, 'PARSER_VERSION', CodeTree.PARSER_VERSION + 1)
+    with pytest.raises(ValueError, match='重新建库'):
+        LSHIndex(path)
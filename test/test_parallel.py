@@ -0,0 +1,27 @@
+import os
+import tempfile
+from parallel import similarity_matrix, serial_similarity_matrix, split_rows
+from batch import build_trees
+from test_similarity import SAMPLES
+
+
+def test_split_rows_covers_upper_triangle():
+    for n in (2, 5, 17):
+        ranges = split_rows(n, 4)
+        assert ranges[0][0] == 0 and ranges[-1][1] == n
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_parallel_matches_serial():
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for i, code in enumerate(SAMPLES):
+            path = os.path.join(folder, f"{i}.c")
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(code)
+            paths.append(path)
+
+        valid_paths, matrix = similarity_matrix(paths, jobs=2)
+        trees = [tree for _, tree in build_trees(paths)]
+        assert valid_paths == paths
+        assert (matrix == serial_similarity_matrix(trees)).all()
@@ -0,0 +1,45 @@
+import tempfile
+from CodeTree import CodeTree
+from CompactTree import CompactTree
+from ParseCache import ParseCache
+
+CODE = """int main() {
+    int sum = 0;
+    for (int i = 0; i < 10; i++) {
+        if (i % 2 == 0) {
+            sum = sum + i;
+        }
+    }
+    printf("%d", sum);
+    return 0;
+}"""
+
+
+def test_dumps_roundtrip():
+    tree = CodeTree()
+    tree.parse_cache = None
+    tree.build_tree(CODE)
+    restored = CompactTree.loads(tree.compact.dumps())
+    for field in ('labels', 'exprs', 'parents', 'first_child', 'next_sibling', 'sizes', 'depths', 'heights', 'hashes'):
+        assert getattr(restored, field) == getattr(tree.compact, field)
+
+
+def test_cache_hits_and_disk_tier():
+    with tempfile.TemporaryDirectory() as disk_dir:
+        cache = ParseCache(max_entries=1, disk_dir=disk_dir)
+        tree1 = CodeTree()
+        tree1.parse_cache = cache
+        tree1.build_tree(CODE)
+        tree2 = CodeTree()
+        tree2.parse_cache = cache
+        tree2.build_tree(CODE)
+        assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 1
+        assert tree2.compact is tree1.compact
+
+        # 超出内存上限被淘汰后，从磁盘层恢复
+        tree2.build_tree("int main() {\n    return 1;\n}")
+        tree2.build_tree(CODE)
+        assert cache.disk_hits == 1
+        assert tree2.text_representation() == tree1.text_representation()
+        assert tree2.preprocessed_code == tree1.preprocessed_code
+        assert tree2.calculate_similarity(tree1) == 1.0
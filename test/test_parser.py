@@ -0,0 +1,121 @@
+from CodeTree import CodeTree
+
+KR_STYLE = """int main() {
+    int n, sum = 0;
+    scanf("%d", &n);
+    for (int i = 0; i < n; i = i + 1) {
+        if (i % 2 == 0) {
+            sum += i;
+        } else if (i % 3 == 0) {
+            sum -= 1;
+        } else {
+            continue;
+        }
+    }
+    switch (n) {
+        case 1:
+            printf("one");
+            break;
+        default:
+            break;
+    }
+    return sum;
+}"""
+
+# 同一份代码：Allman风格大括号、一行多条语句、单语句分支体不加大括号
+REFORMATTED = """int main()
+{
+    int n, sum = 0; scanf("%d", &n);
+    for (int i = 0;
+         i < n;
+         i = i + 1)
+    {
+        if (i % 2 == 0) sum += i;
+        else if (i % 3 == 0)
+            sum -= 1;
+        else
+            continue;
+    }
+    switch (n) { case 1: printf("one"); break; default: break; }
+    return sum;
+}"""
+
+
+def dump(code):
+    tree = CodeTree()
+    tree.build_tree(code)
+    compact = tree.compact
+    return [(compact.depths[i], compact.name(i), compact.expr(i)) for i in range(len(compact))]
+
+
+def test_layout_does_not_change_tree():
+    assert dump(KR_STYLE) == dump(REFORMATTED)
+
+
+def test_statement_nodes():
+    names = [(depth, name) for depth, name, _ in dump(KR_STYLE) if depth <= 3]
+    assert names[:6] == [(0, 'main'), (1, 'variable'), (2, 'expression'), (3, '0'), (1, 'sentence'), (2, 'scanf')]
+    # else if和else是if的兄弟节点，各自带一个block
+    branch = [name for depth, name in names if depth == 3 and name in ('if', 'else if', 'else')]
+    assert branch == ['if', 'else if', 'else']
+    assert (1, 'switch') in names and (3, 'case') in names and (3, 'default') in names
+
+
+def test_dangling_else_and_do_while():
+    tree = dump("""int main() {
+    int k = 0;
+    do { k = k + 1; } while (k < 10);
+    if (k) if (k > 5) k = 1; else k = 2;
+    return k;
+}""")
+    names = [(depth, name) for depth, name, _ in tree]
+    assert (1, 'while') in names
+    # else与最近的if配对，位于外层if的block中
+    assert names.index((3, 'else')) > names.index((3, 'if')) > names.index((1, 'if'))
+
+
+def expression_tree(code):
+    """第一条语句的表达式树，嵌套列表形式"""
+    tree = CodeTree()
+    tree.build_tree("int main() {\n    " + code + "\n}")
+    compact = tree.compact
+
+    def walk(index):
+        children = [walk(child) for child in compact.children(index)]
+        return [compact.name(index)] + children if children else compact.name(index)
+    return walk(compact.first_child[compact.first_child[0]])
+
+
+def test_expression_precedence_and_associativity():
+    assert expression_tree("x = a + b * c - d;") == \
+        ['=', 'var', ['-', ['+', 'var', ['*', 'var', 'var']], 'var']]
+    assert expression_tree("x = y += 1;") == ['=', 'var', ['+=', 'var', '1']]
+    assert expression_tree("x = (a + b) * c;") == ['=', 'var', ['*', ['+', 'var', 'var'], 'var']]
+
+
+def test_expression_unary_ternary_call_subscript_cast():
+    assert expression_tree("x = -a * !b;") == ['=', 'var', ['*', ['-', 'var'], ['!', 'var']]]
+    assert expression_tree("x = n > 0 ? n : -n;") == \
+        ['=', 'var', ['?:', ['>', 'var', '0'], 'var', ['-', 'var']]]
+    assert expression_tree("a[i + 1] = f(x, g(y));") == \
+        ['=', ['[]', 'var', ['+', 'var', '1']], ['call', 'var', 'var', ['call', 'var', 'var']]]
+    assert expression_tree("x = (double)n / 2;") == ['=', 'var', ['/', ['cast', 'double', 'var'], '2']]
+    # 前缀与后缀的自增写法得到相同的树
+    assert expression_tree("i++;") == expression_tree("++i;") == ['++', 'var']
+
+
+def test_member_access_is_postfix():
+    # 成员访问只取一个成员名，之后的下标、调用、自增作用于整个成员表达式
+    assert expression_tree("s.a[i] = p->f(x);") == \
+        ['=', ['[]', ['.', 'var', 'var'], 'var'], ['call', ['->', 'var', 'var'], 'var']]
+    assert expression_tree("x = *p->next;") == ['=', 'var', ['*', ['->', 'var', 'var']]]
+
+
+def test_deep_nesting_does_not_recurse():
+    tree = CodeTree()
+    tree.build_tree("int main() {\n    x = " + "(" * 600 + "a" + ")" * 600 + ";\n"
+                    "    y = " + "f(" * 600 + "a" + ")" * 600 + ";\n}")
+    compact = tree.compact
+    assert [compact.name(i) for i in compact.children(0)] == ['expression', 'expression']
+    # main + 两条语句各自的expression、'='、左值 + 括号内的a + 600层调用（各含函数名）及最内层实参
+    assert len(compact) == 1 + 2 * 3 + 1 + 2 * 600 + 1
@@ -0,0 +1,20 @@
+from prefilter import histogram_matrix, upper_bounds, candidate_pairs
+from test_similarity import build_trees
+
+
+def test_bound_never_below_score():
+    trees = build_trees()
+    bounds = upper_bounds(histogram_matrix(trees), chunk=2)
+    for i in range(len(trees)):
+        for j in range(len(trees)):
+            assert bounds[i, j] >= trees[i].calculate_similarity(trees[j])
+
+
+def test_candidate_pairs_keep_every_pair_above_threshold():
+    trees = build_trees()
+    threshold = 0.5
+    kept = set(candidate_pairs(histogram_matrix(trees), threshold))
+    for i in range(len(trees)):
+        for j in range(i + 1, len(trees)):
+            if trees[i].calculate_similarity(trees[j]) >= threshold:
+                assert (i, j) in kept
@@ -0,0 +1,172 @@
+from CodeTree import CodeTree
+
+# 覆盖控制结构、变量声明、IO语句和switch的示例代码
+SAMPLES = [
+    """int main() {
+    int a = 10;
+    printf("Value is %d", a);
+    return 0;
+}""",
+    """int main() {
+    int score = 85;
+    if (score >= 90) {
+        printf("Excellent!");
+    } else if (score >= 60) {
+        printf("Pass");
+    } else {
+        printf("Fail");
+    }
+    return 0;
+}""",
+    """int main() {
+    for (int i = 1; i <= 10; i++) {
+        if (i % 2 == 0) {
+            printf("%d is even", i);
+        } else {
+            printf("%d is odd", i);
+        }
+    }
+    return 0;
+}""",
+    """int main() {
+    int sum = 0;
+    int k = 1;
+    while (k <= 100) {
+        sum += k;
+        k = k + 1;
+    }
+    printf("Sum: %d", sum);
+    return 0;
+}""",
+    """int main() {
+    switch (value) {
+            case 1: int a = 3; break;
+            case 2: int b = 4; break;
+            default: int c = 5;
+        }
+    return 0;
+}""",
+]
+
+
+def build_trees():
+    trees = []
+    for code in SAMPLES:
+        tree = CodeTree()
+        tree.build_tree(code)
+        trees.append(tree)
+    return trees
+
+
+def test_bucket_matches_greedy():
+    """分桶匹配与原始贪心匹配的结果一致"""
+    trees = build_trees()
+    for tree1 in trees:
+        for tree2 in trees:
+            greedy = tree1.calculate_similarity(tree2, mode='greedy')
+            bucket = tree1.calculate_similarity(tree2, mode='bucket')
+            assert bucket == greedy
+
+
+def test_self_similarity():
+    for tree in build_trees():
+        assert tree.calculate_similarity(tree) == 1.0
+
+
+def test_similar_subtrees_are_maximal():
+    """极大匹配是完整结果的子集，且父节点不再相互匹配"""
+    trees = build_trees()
+    for tree1 in trees:
+        for tree2 in trees:
+            full = {(st1, st2) for st1, st2, _ in tree1.find_similar_subtrees(tree2)}
+            maximal = list(tree1.iter_similar_subtrees(tree2))
+            assert {(st1, st2) for st1, st2, _ in maximal} <= full
+            for st1, st2, _ in maximal:
+                if st1.parent is not None and st2.parent is not None:
+                    assert st1.parent.structure_hash != st2.parent.structure_hash
+            sizes = [st1.size for st1, _, _ in maximal]
+            assert sizes == sorted(sizes, reverse=True)
+
+
+def test_similar_subtrees_pair_one_to_one():
+    """重复的写法一对一配对，已报告的子树对的后代不再报告"""
+    body = "    if (a > b) {\n        c = a + b;\n    } else {\n        c = b;\n    }\n"
+    tree1, tree2 = CodeTree(), CodeTree()
+    tree1.build_tree("int main() {\n" + body * 40 + "}")
+    tree2.build_tree("int main() {\n" + ("    x = 1;\n" + body) * 40 + "}")
+    maximal = list(tree1.iter_similar_subtrees(tree2))
+    assert len(maximal) <= 3 * 40
+    for k, (st1, st2, _) in enumerate(maximal):
+        for other1, other2, _ in maximal[:k]:
+            assert not other1.index <= st1.index < other1.index + other1.size
+            assert not other2.index <= st2.index < other2.index + other2.size
+
+
+def test_ted_mode():
+    """编辑距离模式：自身为1，结果对称，截断后为0"""
+    trees = build_trees()
+    for tree in trees:
+        assert tree.calculate_similarity(tree, mode='ted') == 1.0
+    score = trees[1].calculate_similarity(trees[2], mode='ted')
+    assert 0.0 < score < 1.0
+    assert score == trees[2].calculate_similarity(trees[1], mode='ted')
+    assert trees[1].calculate_similarity(trees[2], mode='ted', max_distance=1) == 0.0
+
+
+def test_ted_mode_is_bounded(build):
+    """无关的两棵树编辑距离可能超过较大树的节点数，重复率仍不低于0"""
+    tree1 = build("int main() {\n    y = -(-(-x));\n}")
+    tree2 = build("int main() {\n    int a = 1;\n    printf(\"%d\", f(g(h(x))));\n}")
+    trees = build_trees() + [tree1, tree2]
+    for a in trees:
+        for b in trees:
+            assert 0.0 <= a.calculate_similarity(b, mode='ted') <= 1.0
+    assert tree1.calculate_similarity(tree2, mode='ted') == 0.0
+
+
+def test_pqgram_mode():
+    """pq-gram模式：自身为1，结果对称，轮廓按树缓存"""
+    trees = build_trees()
+    for tree in trees:
+        assert tree.calculate_similarity(tree, mode='pqgram') == 1.0
+    score = trees[1].calculate_similarity(trees[2], mode='pqgram')
+    assert 0.0 < score < 1.0
+    assert score == trees[2].calculate_similarity(trees[1], mode='pqgram')
+    assert trees[1].pq_profile() is trees[1].pq_profile()
+    assert list(trees[1].pq_profile()) == sorted(trees[1].pq_profile())
+
+
+def test_optimal_mode_never_below_bucket():
+    """最大匹配不少于贪心匹配，且与比较方向无关"""
+    trees = build_trees()
+    for tree1 in trees:
+        for tree2 in trees:
+            optimal = tree1.calculate_similarity(tree2, mode='optimal')
+            assert optimal >= tree1.calculate_similarity(tree2, mode='bucket')
+            assert optimal == tree2.calculate_similarity(tree1, mode='optimal')
+            weighted = tree1.calculate_similarity(tree2, mode='weighted')
+            assert weighted <= optimal + 1e-9
+            assert abs(weighted - tree2.calculate_similarity(tree1, mode='weighted')) < 1e-9
+
+
+def test_depth_transport_matches_brute_force():
+    """按深度归类的运输问题与展开后逐个节点穷举的最大权匹配结果相同"""
+    import random
+    from itertools import permutations
+    from matching import max_weight_transport
+
+    def weight(a, b):
+        return 1.0 - abs(a - b) / 3.0 if abs(a - b) <= 2 else 0.0
+
+    rng = random.Random(7)
+    for _ in range(100):
+        depths1 = [rng.randint(0, 6) for _ in range(rng.randint(1, 6))]
+        depths2 = [rng.randint(0, 6) for _ in range(rng.randint(1, 6))]
+        short, long = sorted((depths1, depths2), key=len)
+        expected = max(sum(weight(a, b) for a, b in zip(short, chosen)) for chosen in permutations(long, len(short)))
+        classes1, classes2 = sorted(set(depths1)), sorted(set(depths2))
+        weights = {(i, j): weight(a, b)
+                   for i, a in enumerate(classes1) for j, b in enumerate(classes2) if abs(a - b) <= 2}
+        result = max_weight_transport([depths1.count(a) for a in classes1],
+                                      [depths2.count(b) for b in classes2], weights)
+        assert abs(result - expected) < 1e-9
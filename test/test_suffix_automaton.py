@@ -0,0 +1,30 @@
+from SuffixAutomaton import SuffixAutomaton
+
+
+def tokens(text, line=1):
+    return [(word, line) for word in text.split()]
+
+
+def test_longest_common_fragment_maps_to_lines():
+    automaton = SuffixAutomaton()
+    a = automaton.add('a.c', tokens("x y", 1) + tokens("p q r s t", 2))
+    b = automaton.add('b.c', tokens("p q r s", 5) + tokens("z", 6))
+    match = automaton.longest_common(a, b)
+    assert match.tokens1 == (2, 6) and match.tokens2 == (0, 4)
+    assert match.lines1 == (2, 2) and match.lines2 == (5, 5)
+    assert automaton.longest_common(a, automaton.add('c.c', tokens("u v"))) is None
+
+
+def test_fragments_shared_by_k_submissions():
+    automaton = SuffixAutomaton()
+    leaked = "for var = 0 ; var < var ; var ++"
+    automaton.add('a.c', tokens("int var ; " + leaked))
+    automaton.add('b.c', tokens(leaked + " return 0 ;"))
+    automaton.add('c.c', tokens("char var ; " + leaked + " break ;"))
+    automaton.add('d.c', tokens("while ( 1 ) { }"))
+
+    fragments = automaton.common_fragments(k=3, min_length=5)
+    assert fragments[0].length == len(leaked.split())
+    assert fragments[0].count == 3
+    # 极大片段的子片段不再单独报告
+    assert len(fragments) == 1
@@ -0,0 +1,59 @@
+import pytest
+from CodeTree import CodeTree
+from Template import Template
+from prefilter import histogram_matrix, upper_bounds
+
+SKELETON = """int main() {
+    printf("Please input n:");
+    return 0;
+}"""
+
+STUDENT1 = """int main() {
+    printf("Please input n:");
+    int n;
+    scanf("%d", &n);
+    printf("%d", n * n);
+    return 0;
+}"""
+
+STUDENT2 = """int main() {
+    printf("Please input n:");
+    int n;
+    scanf("%d", &n);
+    for (int i = 0; i < n; i++) {
+        n = n - i;
+    }
+    return 0;
+}"""
+
+
+def test_template_nodes_are_excluded(build):
+    template = Template([SKELETON])
+    tree = build(STUDENT1)
+    excluded = template.excluded(tree.compact)
+    names = sorted(tree.compact.name(index) for index in excluded)
+    assert names == sorted(['main', 'sentence', 'printf', 'arg: var var var:', 'return', 'expression', '0'])
+
+
+def test_scores_ignore_template(build):
+    tree1, tree2 = build(STUDENT1), build(STUDENT2)
+    before = tree1.calculate_similarity(tree2)
+    subtrees_before = tree1.find_similar_subtrees(tree2)
+    try:
+        CodeTree.template = Template([SKELETON])
+        after = tree1.calculate_similarity(tree2)
+        for mode in ('greedy', 'optimal'):
+            assert tree1.calculate_similarity(tree2, mode=mode) == after
+        # 对全部节点计分的模式拒绝计算，而不是悄悄忽略模板
+        for mode in ('ted', 'pqgram', 'lcs', 'kernel'):
+            with pytest.raises(ValueError, match='不支持教师模板'):
+                tree1.calculate_similarity(tree2, mode=mode)
+        assert len(tree1.find_similar_subtrees(tree2)) < len(subtrees_before)
+        assert build(SKELETON).calculate_similarity(build(SKELETON)) == 0.0
+
+        # 排除模板后直方图上界依然成立
+        bounds = upper_bounds(histogram_matrix([tree1, tree2]))
+        assert bounds[0, 1] >= after
+    finally:
+        CodeTree.template = None
+    assert after < before
@@ -0,0 +1,43 @@
+from winnow import rolling_hashes, winnow, compare_trees
+
+CODE = """int main() {
+    int sum = 0;
+    for (int i = 0; i < 10; i++) {
+        if (i % 2 == 0) {
+            sum = sum + i;
+        }
+    }
+    printf("%d", sum);
+    return 0;
+}"""
+
+# 同一段代码改名并压成一行，按行建树的比较会失效
+ONE_LINE = """int main() { int total = 0; for (int k = 0; k < 10; k++) { if (k % 2 == 0) { total = total + k; } } printf("%d", total); return 0; }"""
+
+
+def test_rolling_hash_matches_direct_hash():
+    texts = ['a', 'b', 'c', 'a', 'b', 'c', 'd']
+    hashes = rolling_hashes(texts, k=3)
+    assert len(hashes) == 5
+    assert hashes[0] == hashes[3]
+    assert hashes[0] != hashes[1]
+
+
+def test_winnow_covers_every_window():
+    hashes = [5, 3, 8, 1, 9, 2, 7, 6, 4]
+    window = 3
+    selected = winnow(hashes, window)
+    positions = [pos for _, pos in selected]
+    for start in range(len(hashes) - window + 1):
+        best = min(hashes[start:start + window])
+        assert any(start <= pos < start + window and hashes[pos] == best for pos in positions)
+
+
+def test_layout_and_renaming_do_not_matter(build):
+    result = compare_trees(build(CODE), build(ONE_LINE))
+    assert result.jaccard == 1.0
+    assert len(result.matches) == 1
+    match = result.matches[0]
+    # 匹配区域由选中的指纹拼接而成，首尾可能差几个token
+    assert match.lines1[0] <= 2 and match.lines1[1] >= 8
+    assert match.lines2 == (1, 1)
@@ -0,0 +1,129 @@
+from collections import deque, namedtuple
+from fingerprint import hash_text
+
+# ====================
+# Winnowing指纹（MOSS）：在标识符归一化后的token流上计算滚动k-gram哈希，
+# 每个窗口只保留最小的哈希作为指纹，与换行/缩进等排版无关
+# ====================
+
+# 一段匹配区域：两份代码中的token区间[start, end)及对应的源代码行范围
+Match = namedtuple('Match', ['tokens1', 'tokens2', 'lines1', 'lines2'])
+# 比较结果：Jaccard系数、双方被对方包含的比例、匹配区域列表
+WinnowResult = namedtuple('WinnowResult', ['jaccard', 'containment1', 'containment2', 'matches'])
+
+MODULUS = (1 << 61) - 1  # 梅森素数，取模运算快且冲突少
+BASE = 1000003
+
+
+def rolling_hashes(texts, k=5):
+    """Karp-Rabin滚动哈希：对每个长度为k的窗口计算哈希，总时间O(n)"""
+    n = len(texts)
+    if n < k:
+        return []
+
+    # 相同的token文本只哈希一次
+    cache = {}
+    values = []
+    for text in texts:
+        value = cache.get(text)
+        if value is None:
+            value = cache[text] = hash_text(text) % MODULUS
+        values.append(value)
+
+    top = pow(BASE, k - 1, MODULUS)  # 窗口最高位的权重
+    h = 0
+    for value in values[:k]:
+        h = (h * BASE + value) % MODULUS
+    hashes = [h]
+    for i in range(k, n):
+        h = ((h - values[i - k] * top) * BASE + values[i]) % MODULUS
+        hashes.append(h)
+    return hashes
+
+
+def winnow(hashes, window=4):
+    """在每个长度为window的窗口中选取最小哈希（相同时取最右），返回[(哈希, 位置)]
+
+    单调队列保证每个位置只进出队一次，总时间O(n)
+    """
+    if not hashes:
+        return []
+    window = min(window, len(hashes))
+
+    selected = []
+    queue = deque()  # 位置，对应的哈希严格递增
+    last = -1
+    for i, h in enumerate(hashes):
+        while queue and hashes[queue[-1]] >= h:
+            queue.pop()
+        queue.append(i)
+        if queue[0] <= i - window:
+            queue.popleft()
+        if i >= window - 1 and queue[0] != last:
+            last = queue[0]
+            selected.append((hashes[last], last))
+    return selected
+
+
+def winnow_tokens(tokens, k=5, window=4):
+    """对(token文本, 行号)序列计算Winnowing指纹，返回[(哈希, 起始token位置)]"""
+    return winnow(rolling_hashes([text for text, _ in tokens], k), window)
+
+
+def resemblance(set1, set2):
+    """两个指纹集合的(Jaccard系数, set1被包含比例, set2被包含比例)"""
+    shared = len(set1 & set2)
+    union = len(set1) + len(set2) - shared
+    return (shared / union if union else 0.0,
+            shared / len(set1) if set1 else 0.0,
+            shared / len(set2) if set2 else 0.0)
+
+
+def compare_tokens(tokens1, tokens2, k=5, window=4, template=None):
+    """比较两份代码的token流，返回WinnowResult
+
+    参数:
+        tokens1, tokens2 (list): CodeTree.normalized_tokens()的结果
+        k (int): k-gram长度，短于k的重复不会被发现
+        window (int): 窗口大小，长度不小于window+k-1的重复一定会被发现
+        template (Template): 教师模板，其中出现过的k-gram不计入
+    """
+    prints1 = winnow_tokens(tokens1, k, window)
+    prints2 = winnow_tokens(tokens2, k, window)
+    if template is not None:
+        prints1 = [(h, pos) for h, pos in prints1 if h not in template.kgrams]
+        prints2 = [(h, pos) for h, pos in prints2 if h not in template.kgrams]
+    set1 = {h for h, _ in prints1}
+    set2 = {h for h, _ in prints2}
+    shared = set1 & set2
+    jaccard, containment1, containment2 = resemblance(set1, set2)
+
+    # 指纹在第二份代码中首次出现的位置
+    positions2 = {}
+    for h, pos in prints2:
+        if h in shared:
+            positions2.setdefault(h, pos)
+
+    # 沿第一份代码顺序合并位置偏移一致且相邻的指纹，得到连续的匹配区域
+    regions = []
+    for h, pos1 in prints1:
+        pos2 = positions2.get(h)
+        if pos2 is None:
+            continue
+        if regions:
+            start1, end1, start2, end2, last1, last2 = regions[-1]
+            if pos1 - last1 == pos2 - last2 and pos1 - last1 <= window:
+                regions[-1] = [start1, pos1 + k, start2, pos2 + k, pos1, pos2]
+                continue
+        regions.append([pos1, pos1 + k, pos2, pos2 + k, pos1, pos2])
+
+    matches = [Match((start1, end1), (start2, end2),
+                     (tokens1[start1][1], tokens1[end1 - 1][1]),
+                     (tokens2[start2][1], tokens2[end2 - 1][1]))
+               for start1, end1, start2, end2, _, _ in regions]
+    return WinnowResult(jaccard, containment1, containment2, matches)
+
+
+def compare_trees(tree1, tree2, k=5, window=4):
+    """比较两棵代码树对应的源代码（使用tree1的教师模板）"""
+    return compare_tokens(tree1.normalized_tokens(), tree2.normalized_tokens(), k, window, tree1.template)